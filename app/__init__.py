@@ -17,6 +17,7 @@ SOFTWARE.
 from .project_folder.controller import ProjectFolderController as ProjectFolder
 from .project.controller import ProjectController as Project
 from .cpt_file.controller import CPTFileController as CPTFile
+from .cpt_file.controller import ImportedCPTFileController as ImportedCPTFile
 
 from viktor import InitialEntity
 
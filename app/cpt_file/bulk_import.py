@@ -0,0 +1,78 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from io import StringIO
+from typing import BinaryIO
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from viktor.core import progress_message
+from viktor.geo import GEFParsingException
+from .parsing import parse_gef_stream
+
+
+def _parse_archive_member(name: str, content: bytes) -> Tuple[str, Optional[dict], Optional[str]]:
+    """Parse one GEF file of an archive, returning the parsing error instead of raising it"""
+    try:
+        return name, parse_gef_stream(StringIO(content.decode("ISO-8859-1")), file_name=os.path.basename(name)), None
+    except GEFParsingException as parsing_exception:
+        return name, None, str(parsing_exception)
+
+
+def gef_archive_members(archive: zipfile.ZipFile) -> List[str]:
+    """Names of the GEF files in a zip archive, in archive order"""
+    return [info.filename for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.gef')]
+
+
+def parse_gef_archive(archive_file: BinaryIO, max_workers: int = None) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Parse all GEF files in a zip archive. Files are parsed concurrently in a process pool, `max_workers=1` parses
+    them serially in the current process. Returns the params per file name and the parsing errors per file name, so a
+    single invalid file does not abort the batch.
+    """
+    parsed_files: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    with zipfile.ZipFile(archive_file) as archive:
+        names = gef_archive_members(archive)
+        if not names:
+            return parsed_files, errors
+
+        def report(name, params, error, done):
+            if error is None:
+                parsed_files[name] = params
+            else:
+                errors[name] = error
+            progress_message(f"Parsed {os.path.basename(name)} ({done}/{len(names)})",
+                             percentage=done / len(names) * 100)
+
+        if max_workers == 1:
+            for done, name in enumerate(names, start=1):
+                report(*_parse_archive_member(name, archive.read(name)), done)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_parse_archive_member, name, archive.read(name)) for name in names]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    report(*future.result(), done)
+
+    # Keep the archive order, independent of the order in which the workers finished
+    return {name: parsed_files[name] for name in names if name in parsed_files}, errors
@@ -0,0 +1,226 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict
+from typing import Optional
+
+import numpy as np
+
+from .model import CPT
+from .serialization import content_hash
+
+CACHE_DIRECTORY = Path(os.environ.get('CPT_CACHE_DIRECTORY', Path(tempfile.gettempdir()) / 'cpt-cache'))
+MEMORY_BUDGET = int(os.environ.get('CPT_CACHE_MEMORY_BUDGET', 256 * 1024 ** 2))  # bytes
+DISK_BUDGET = int(os.environ.get('CPT_CACHE_DISK_BUDGET', 1024 ** 3))  # bytes
+DERIVED_MEMORY_BUDGET = int(os.environ.get('CPT_CACHE_DERIVED_MEMORY_BUDGET', 32 * 1024 ** 2))  # bytes
+
+Columns = Dict[str, np.ndarray]
+
+
+def cpt_key(cpt_params) -> str:
+    """Content hash of the headers and measurement data of a cpt, as stored at upload or computed for older CPT Files"""
+    return cpt_params.get('content_hash') or content_hash(cpt_params['headers'], cpt_params['measurement_data'])
+
+
+class CPTCache:
+    """
+    Content-addressed LRU cache of prepared cpt columns. Entries are kept in memory up to `memory_budget` bytes, least
+    recently used entries are spilled to `.npz` files in `directory`, which in turn is limited to `disk_budget` bytes.
+    The derived data that is recomputed for CPT Files stored by an older version of the app is kept in memory as well,
+    up to `derived_budget` bytes.
+    """
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET, disk_budget: int = DISK_BUDGET,
+                 directory: Path = CACHE_DIRECTORY, derived_budget: int = DERIVED_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.derived_budget = derived_budget
+        self.directory = Path(directory)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, Columns]' = OrderedDict()
+        self._memory_size = 0
+        self._disk: 'OrderedDict[str, int]' = OrderedDict()
+        self._disk_size = 0
+        self._derived: 'OrderedDict[str, dict]' = OrderedDict()
+        self._derived_size = 0
+        self._lock = threading.RLock()
+        self._load_disk_index()
+
+    def get(self, key: str) -> Optional[Columns]:
+        """Return the cached columns for `key`, or None when they are neither in memory nor on disk"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if key in self._disk:
+                columns = self._read(key)
+                if columns is not None:
+                    self.disk_hits += 1
+                    self._put_in_memory(key, columns)
+                    return columns
+            self.misses += 1
+            return None
+
+    def put(self, key: str, columns: Columns) -> None:
+        """Store the columns for `key`, evicting least recently used entries when over budget"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._put_in_memory(key, columns)
+
+    def get_derived(self, key: str) -> Optional[dict]:
+        """Return the recomputed derived data for `key`, or None when it is not cached"""
+        with self._lock:
+            if key in self._derived:
+                self._derived.move_to_end(key)
+                return self._derived[key]
+            return None
+
+    def put_derived(self, key: str, derived_data: dict) -> None:
+        """Store recomputed derived data for `key`, evicting least recently used entries when over budget"""
+        with self._lock:
+            if key in self._derived:
+                self._derived.move_to_end(key)
+                return
+            self._derived[key] = derived_data
+            self._derived_size += _derived_size(derived_data)
+            while self._derived_size > self.derived_budget and len(self._derived) > 1:
+                _, evicted = self._derived.popitem(last=False)
+                self._derived_size -= _derived_size(evicted)
+
+    def clear(self) -> None:
+        """Remove all entries from memory and disk"""
+        with self._lock:
+            for key in list(self._disk):
+                self._remove_from_disk(key)
+            self._memory.clear()
+            self._memory_size = 0
+            self._derived.clear()
+            self._derived_size = 0
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_size,
+                'derived_entries': len(self._derived),
+                'derived_bytes': self._derived_size,
+            }
+
+    def _put_in_memory(self, key: str, columns: Columns) -> None:
+        self._memory[key] = columns
+        self._memory_size += _size(columns)
+        while self._memory_size > self.memory_budget and len(self._memory) > 1:
+            evicted_key, evicted_columns = self._memory.popitem(last=False)
+            self._memory_size -= _size(evicted_columns)
+            self._spill(evicted_key, evicted_columns)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.npz'
+
+    def _spill(self, key: str, columns: Columns) -> None:
+        if key in self._disk or self.disk_budget <= 0:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary_path = self.directory / f'{key}.{threading.get_ident()}.tmp'
+            with open(temporary_path, 'wb') as file:
+                np.savez(file, **columns)
+            os.replace(temporary_path, self._path(key))
+        except OSError:
+            return  # the disk store is best effort, a failed spill only costs a future miss
+        size = self._path(key).stat().st_size
+        self._disk[key] = size
+        self._disk_size += size
+        while self._disk_size > self.disk_budget and self._disk:
+            self._remove_from_disk(next(iter(self._disk)))
+
+    def _read(self, key: str) -> Optional[Columns]:
+        try:
+            with np.load(self._path(key)) as stored:
+                columns = {name: stored[name] for name in stored.files}
+        except (OSError, ValueError):
+            self._remove_from_disk(key)
+            return None
+        for column in columns.values():
+            column.setflags(write=False)
+        self._disk.move_to_end(key)
+        return columns
+
+    def _remove_from_disk(self, key: str) -> None:
+        self._disk_size -= self._disk.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load_disk_index(self) -> None:
+        """Pick up entries spilled by earlier processes on this worker, oldest first"""
+        if not self.directory.is_dir():
+            return
+        for path in sorted(self.directory.glob('*.npz'), key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._disk[path.stem] = size
+            self._disk_size += size
+
+
+def _size(columns: Columns) -> int:
+    return sum(column.nbytes for column in columns.values())
+
+
+def _derived_size(derived_data: dict) -> int:
+    """Approximate size of derived data: its encoded columns and the layer lists"""
+    columns = derived_data['columns']['columns'].values()
+    return sum(len(column) for column in columns) + 3 * 8 * len(derived_data['layers']['zone'])
+
+
+_shared_cache: Optional[CPTCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_cache() -> CPTCache:
+    """Cache shared by all requests handled by this worker"""
+    global _shared_cache  # pylint: disable=global-statement
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = CPTCache()
+        return _shared_cache
+
+
+def load_cpt(cpt_params, cache: CPTCache = None) -> CPT:
+    """Create a CPT object, reusing prepared columns of identical cpt data from the cache"""
+    cache = cache or get_cache()
+    key = cpt_key(cpt_params)
+    columns = cache.get(key)
+    cpt = CPT(cpt_params, columns=columns, key=key, cache=cache)
+    if columns is None:
+        cache.put(key, cpt.columns)
+    return cpt
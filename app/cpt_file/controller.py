@@ -18,26 +18,38 @@ from viktor import File
 from viktor import ParamsFromFile
 from viktor import UserError
 from viktor import ViktorController
-from viktor.geo import GEFFile
 from viktor.geo import GEFParsingException
 from .parametrization import CPTParametrization
+from .parsing import ADDITIONAL_COLUMNS
+from .parsing import parse_gef_stream
+
+# Entity types of which the params are those of a CPT File: uploaded GEF files and the CPTs imported from an archive
+CPT_ENTITY_TYPES = ['CPTFile', 'ImportedCPTFile']
 
 
 class CPTFileController(ViktorController):
     hide_editor = True
     """Controller class which acts as interface for the Sample entity type."""
     label = "CPT File"
-    ADDITIONAL_COLUMNS = []
+    ADDITIONAL_COLUMNS = ADDITIONAL_COLUMNS
     parametrization = CPTParametrization
 
     @ParamsFromFile(file_types=['.gef'])
     def process_file(self, file: File, **kwargs) -> dict:
         """Process the CPT file when it is first uploaded"""
-        cpt_file = GEFFile(file.getvalue("ISO-8859-1"))
-
         try:
-            cpt_data_object = cpt_file.parse(additional_columns=self.ADDITIONAL_COLUMNS, return_gef_data_obj=True)
+            with file.open(encoding="ISO-8859-1") as stream:
+                return parse_gef_stream(stream, additional_columns=self.ADDITIONAL_COLUMNS,
+                                        file_name=kwargs.get('entity_name'))
         except GEFParsingException as parsing_exception:
             raise UserError(f"CPT Parsing: {str(parsing_exception)}") from parsing_exception
 
-        return cpt_data_object.serialize()
+
+class ImportedCPTFileController(ViktorController):
+    hide_editor = True
+    """
+    Controller class for the CPTs of a bulk import. The platform can not create file-type entities through the API, so
+    an imported GEF file is stored as an entity of this type with the parsed params of a CPT File.
+    """
+    label = "Imported CPT File"
+    parametrization = CPTParametrization
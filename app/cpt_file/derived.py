@@ -0,0 +1,186 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Dict
+from typing import List
+
+import numpy as np
+
+from .serialization import decode_column
+from .serialization import encode_measurement_data
+
+DERIVED_VERSION = 2
+
+# Assumptions for the derived quantities, the GEF files do not provide these
+CONE_AREA_RATIO = 0.8  # net area ratio a of the cone, used for qt = qc + u2 * (1 - a)
+GROUNDWATER_DEPTH = 1.0  # m below ground level
+WATER_UNIT_WEIGHT = 10.  # kN/m3
+MIN_UNIT_WEIGHT = 14.  # kN/m3
+MAX_UNIT_WEIGHT = 22.  # kN/m3
+ATMOSPHERIC_PRESSURE = 0.1  # MPa
+IC_ITERATIONS = 10
+IC_TOLERANCE = 1e-3
+MIN_LAYER_THICKNESS = 0.2  # m
+IC_HYSTERESIS = 0.02  # the smoothed Ic must cross a zone boundary by this margin to start a new layer
+
+# Upper Ic boundaries of the soil behaviour type zones 7 to 3 of Robertson (2009), zone 2 is above the last one
+SBT_ZONE_BOUNDARIES = (1.31, 2.05, 2.6, 2.95, 3.6)
+SBT_ZONE_NAMES = {
+    2: 'Organic soils - clay',
+    3: 'Clays - silty clay to clay',
+    4: 'Silt mixtures - clayey silt to silty clay',
+    5: 'Sand mixtures - silty sand to sandy silt',
+    6: 'Sands - clean sand to silty sand',
+    7: 'Gravelly sand to dense sand',
+}
+
+
+def _vertical_stress(depth: np.ndarray, unit_weight: np.ndarray) -> np.ndarray:
+    """Total vertical stress [MPa] at each depth [m], integrating the unit weight [kN/m3] from the ground level"""
+    order = np.argsort(depth, kind='stable')
+    thickness = np.diff(depth[order], prepend=0.)
+    stress = np.empty_like(depth)
+    stress[order] = np.cumsum(unit_weight[order] * thickness) / 1e3
+    return stress
+
+
+def derived_quantities(depth: np.ndarray, qc: np.ndarray, fs: np.ndarray,
+                       u2: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """
+    Corrected cone resistance qt [MPa], normalized cone resistance Qtn [-], normalized friction ratio Fr [%] and soil
+    behaviour type index Ic [-] after Robertson (2009), for the depth [m] below ground level, qc [MPa], sleeve
+    friction fs [MPa] and, if measured, pore pressure u2 [MPa]. The stress exponent n is solved iteratively for all
+    points at once. Points without a valid value are NaN.
+    """
+    depth = np.where(np.isfinite(depth), np.maximum(depth, 0.), 0.)
+    qt = qc if u2 is None else np.where(np.isfinite(u2), qc + u2 * (1 - CONE_AREA_RATIO), qc)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Unit weight estimated from the cpt itself (Robertson and Cabal, 2010)
+        unit_weight = WATER_UNIT_WEIGHT * (0.27 * np.log10(fs / qt * 100) + 0.36 * np.log10(qt / ATMOSPHERIC_PRESSURE)
+                                           + 1.236)
+        unit_weight = np.clip(np.nan_to_num(unit_weight, nan=18.), MIN_UNIT_WEIGHT, MAX_UNIT_WEIGHT)
+        total_stress = _vertical_stress(depth, unit_weight)
+        pore_pressure = WATER_UNIT_WEIGHT * np.maximum(depth - GROUNDWATER_DEPTH, 0.) / 1e3
+        effective_stress = np.maximum(total_stress - pore_pressure, 1e-3)
+
+        net_resistance = qt - total_stress
+        valid = (net_resistance > 0) & (fs > 0)
+        net_resistance = np.where(valid, net_resistance, np.nan)
+        fr = fs / net_resistance * 100
+
+        exponent = np.ones_like(qt)
+        ic = np.full_like(qt, np.nan)
+        for _ in range(IC_ITERATIONS):
+            qtn = net_resistance / ATMOSPHERIC_PRESSURE * (ATMOSPHERIC_PRESSURE / effective_stress) ** exponent
+            previous, ic = ic, np.sqrt((3.47 - np.log10(qtn)) ** 2 + (np.log10(fr) + 1.22) ** 2)
+            exponent = np.minimum(0.381 * ic + 0.05 * effective_stress / ATMOSPHERIC_PRESSURE - 0.15, 1.)
+            if np.nanmax(np.abs(ic - previous), initial=0.) < IC_TOLERANCE:
+                break
+    return {'qt': qt, 'Qtn': qtn, 'Fr': fr, 'Ic': ic}
+
+
+def sbt_zone(ic: np.ndarray) -> np.ndarray:
+    """Soil behaviour type zone (2 to 7) of Robertson (2009) for each Ic, NaN where Ic is NaN"""
+    zone = 7. - np.digitize(ic, SBT_ZONE_BOUNDARIES)
+    zone[~np.isfinite(ic)] = np.nan
+    return zone
+
+
+def _sbt_zone_with_hysteresis(ic: np.ndarray, band: float) -> np.ndarray:
+    """
+    Soil behaviour type zone for a sequence of finite Ic values, where the zone only changes once Ic crosses a zone
+    boundary by more than `band`. Values within the band of a boundary keep the side of the preceding values, so
+    rounding differences of Ic close to a boundary do not split a layer.
+    """
+    positions = np.arange(len(ic))
+    zone = np.full(len(ic), 7.)
+    for boundary in SBT_ZONE_BOUNDARIES:
+        decided = np.abs(ic - boundary) > band
+        # Before the first decided value the side of the first value is used
+        last_decided = np.maximum.accumulate(np.where(decided, positions, 0))
+        zone -= ic[last_decided] >= boundary
+    return zone
+
+
+def segment_layers(elevation: np.ndarray, ic: np.ndarray, min_thickness: float = MIN_LAYER_THICKNESS,
+                   hysteresis: float = IC_HYSTERESIS) -> Dict[str, List]:
+    """
+    Split a cpt in layers of one soil behaviour type zone. Ic is first smoothed with a moving average over about
+    `min_thickness`, a new layer starts where the smoothed Ic crosses a zone boundary by more than `hysteresis`, and
+    the remaining layers thinner than `min_thickness` are merged into the layer above. Returns the top and bottom
+    elevation (in the unit of `elevation`) and the zone of each layer, from top to bottom.
+    """
+    valid = np.isfinite(elevation) & np.isfinite(ic)
+    order = np.argsort(-elevation[valid], kind='stable')
+    elevation, ic = elevation[valid][order], ic[valid][order]
+    layers = {'top': [], 'bottom': [], 'zone': []}
+    if len(elevation) < 2:
+        return layers
+
+    spacing = np.median(np.abs(np.diff(elevation)))
+    window = max(int(round(min_thickness / spacing)), 1) if spacing > 0 else 1
+    if window > 1:
+        cumulative = np.cumsum(np.concatenate(([0.], ic)))
+        lower = np.clip(np.arange(len(ic)) - window // 2, 0, len(ic))
+        upper = np.clip(lower + window, 0, len(ic))
+        ic = (cumulative[upper] - cumulative[lower]) / (upper - lower)
+    zones = _sbt_zone_with_hysteresis(ic, hysteresis)
+    # Layers of exactly min_thickness on a regular grid must not depend on the rounding of the elevations
+    min_thickness -= 1e-6 * min_thickness
+
+    starts = np.flatnonzero(np.diff(zones, prepend=np.nan) != 0)
+    ends = np.append(starts[1:], len(zones))
+    for start, end in zip(starts, ends):
+        top, bottom, zone = float(elevation[start]), float(elevation[end - 1]), int(zones[start])
+        if layers['zone'] and (top - bottom < min_thickness or layers['zone'][-1] == zone):
+            layers['bottom'][-1] = bottom
+            continue
+        layers['top'].append(top)
+        layers['bottom'].append(bottom)
+        layers['zone'].append(zone)
+    return layers
+
+
+def compute_derived_data(measurement_data: dict, headers: dict) -> dict:
+    """
+    Derived quantities of a cpt in the format stored next to the measurement data in the params of a CPT File: the
+    encoded qt, Qtn, Fr and Ic columns, the layer segmentation (elevations in mm) and the DERIVED_VERSION they were
+    computed with. Accepts the measurement data in the list, array and binary column format.
+    """
+    elevation = decode_column(measurement_data, 'elevation')
+    qc = decode_column(measurement_data, 'qc')
+    if 'fs' in _column_names(measurement_data):
+        fs = decode_column(measurement_data, 'fs')
+    else:
+        fs = decode_column(measurement_data, 'Rf') * qc
+    u2 = decode_column(measurement_data, 'u2') if 'u2' in _column_names(measurement_data) else None
+
+    depth = (headers['ground_level_wrt_reference'] - elevation) / 1e3
+    columns = derived_quantities(depth, qc, fs, u2)
+    layers = segment_layers(elevation, columns['Ic'], min_thickness=MIN_LAYER_THICKNESS * 1e3)
+    layers['top'] = [round(top, 1) for top in layers['top']]
+    layers['bottom'] = [round(bottom, 1) for bottom in layers['bottom']]
+    return {'version': DERIVED_VERSION, 'columns': encode_measurement_data(columns), 'layers': layers}
+
+
+def is_current(derived_data: dict) -> bool:
+    """True if stored derived data was computed with the current DERIVED_VERSION"""
+    return bool(derived_data) and derived_data.get('version') == DERIVED_VERSION
+
+
+def _column_names(measurement_data: dict):
+    return measurement_data['columns'] if 'schema_version' in measurement_data else measurement_data
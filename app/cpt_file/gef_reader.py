@@ -0,0 +1,201 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from itertools import islice
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import TextIO
+
+import numpy as np
+
+from viktor.geo import GEFParsingException
+
+CHUNK_LINES = 65536
+INITIAL_CAPACITY = 65536
+
+# GEF quantity numbers of the columns that are read
+PENETRATION_LENGTH = 1
+CONE_RESISTANCE = 2
+LOCAL_FRICTION = 3
+FRICTION_RATIO = 4
+PORE_PRESSURE_U2 = 6
+INCLINATION = 8
+INCLINATION_N_S = 9
+INCLINATION_E_W = 10
+CORRECTED_DEPTH = 11
+
+ADDITIONAL_COLUMN_QUANTITIES = {
+    'penetration_length': PENETRATION_LENGTH,
+    'corrected_depth': CORRECTED_DEPTH,
+    'fs': LOCAL_FRICTION,
+    'u2': PORE_PRESSURE_U2,
+    'inclination': INCLINATION,
+    'inclination_n_s': INCLINATION_N_S,
+    'inclination_e_w': INCLINATION_E_W,
+}
+
+
+class GEFHeader:
+    """The header block of a GEF file, read once before the data block is streamed"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.column_count = 0
+        self.columns: Dict[int, int] = {}  # quantity number -> column index
+        self.voids: Dict[int, float] = {}  # column index -> void sentinel
+        self.column_separator = ' '
+        self.record_separator: Optional[str] = None
+        self.last_scan: Optional[int] = None
+        self.name: Optional[str] = None
+        self.ground_level: Optional[float] = None  # m
+        self.x_y_coordinates: Optional[List[float]] = None
+        self.height_system: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.lines)
+
+    def headers(self, file_name: str = None) -> dict:
+        """
+        Headers in the format of the params of a CPT File. The name falls back to `file_name` when the file has no
+        #TESTID. Only the headers that the app uses are read: GEFFile also stores optional fields such as the project id,
+        file date and cone type, which are not available for files parsed with this reader.
+        """
+        headers = {
+            'name': self.name or file_name,
+            'ground_level_wrt_reference': self.ground_level * 1e3,
+            'height_system': self.height_system,
+        }
+        if self.x_y_coordinates is not None:
+            headers['x_y_coordinates'] = self.x_y_coordinates
+        return headers
+
+
+def read_gef_header(stream: TextIO) -> GEFHeader:
+    """Read the header lines of a GEF file, leaving the stream at the first line of the data block"""
+    header = GEFHeader()
+    for line in stream:
+        header.lines.append(line)
+        keyword, _, value = line.strip().partition('=')
+        keyword = keyword.strip().upper()
+        fields = [field.strip() for field in value.split(',')]
+        try:
+            if keyword == '#COLUMN':
+                header.column_count = int(fields[0])
+            elif keyword == '#COLUMNINFO':
+                header.columns[int(fields[3])] = int(fields[0]) - 1
+            elif keyword == '#COLUMNVOID':
+                header.voids[int(fields[0]) - 1] = float(fields[1])
+            elif keyword == '#COLUMNSEPARATOR':
+                header.column_separator = value.strip() or ' '
+            elif keyword == '#RECORDSEPARATOR':
+                header.record_separator = value.strip() or None
+            elif keyword == '#LASTSCAN':
+                header.last_scan = int(fields[0])
+            elif keyword == '#TESTID':
+                header.name = fields[0]
+            elif keyword == '#ZID':
+                header.ground_level = float(fields[1])
+            elif keyword == '#XYID':
+                header.x_y_coordinates = [float(fields[1]), float(fields[2])]
+            elif keyword == '#MEASUREMENTTEXT' and fields[0] == '9':
+                header.height_system = fields[1]
+            elif keyword == '#EOH':
+                return header
+        except (IndexError, ValueError) as error:
+            raise GEFParsingException(f"Invalid header line '{line.strip()}'") from error
+    raise GEFParsingException("The GEF file has no end of header (#EOH)")
+
+
+class _ColumnBuffer:
+    """Preallocated row buffer that doubles its capacity when it is full"""
+
+    def __init__(self, column_count: int, capacity: int):
+        self.data = np.empty((max(capacity, 1), column_count))
+        self.length = 0
+
+    def extend(self, rows: np.ndarray) -> None:
+        required = self.length + len(rows)
+        if required > len(self.data):
+            grown = np.empty((max(required, 2 * len(self.data)), self.data.shape[1]))
+            grown[:self.length] = self.data[:self.length]
+            self.data = grown
+        self.data[self.length:required] = rows
+        self.length = required
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.length]
+
+
+def read_gef_data(stream: TextIO, header: GEFHeader, chunk_lines: int = CHUNK_LINES) -> np.ndarray:
+    """
+    Read the data block in chunks of lines into a (rows, columns) float array, with NaN for void values. Only one chunk
+    of text is held in memory at a time.
+    """
+    if not header.column_count:
+        raise GEFParsingException("The GEF file has no #COLUMN header")
+    buffer = _ColumnBuffer(header.column_count, header.last_scan or INITIAL_CAPACITY)
+    while True:
+        lines = list(islice(stream, chunk_lines))
+        if not lines:
+            break
+        text = ''.join(lines)
+        if header.record_separator:
+            text = text.replace(header.record_separator, ' ')
+        if header.column_separator.strip():
+            text = text.replace(header.column_separator, ' ')
+        try:
+            values = np.array(text.split(), dtype=np.float64)
+        except ValueError as error:
+            raise GEFParsingException("The data block of the GEF file contains non-numeric values") from error
+        if len(values) % header.column_count:
+            raise GEFParsingException(f"The data block of the GEF file does not have {header.column_count} columns")
+        buffer.extend(values.reshape(-1, header.column_count))
+
+    data = buffer.view()
+    for column, void in header.voids.items():
+        if column < header.column_count:
+            data[data[:, column] == void, column] = np.nan
+    return data
+
+
+def measurement_columns(header: GEFHeader, data: np.ndarray, additional_columns: List[str] = ()) -> dict:
+    """Elevation [mm], qc [MPa] and Rf [-] plus the requested additional columns, as arrays"""
+    def column(quantity: int) -> Optional[np.ndarray]:
+        return data[:, header.columns[quantity]] if quantity in header.columns else None
+
+    depth = column(CORRECTED_DEPTH) if CORRECTED_DEPTH in header.columns else column(PENETRATION_LENGTH)
+    qc = column(CONE_RESISTANCE)
+    if depth is None or qc is None:
+        raise GEFParsingException("The GEF file needs a penetration length (or corrected depth) and qc column")
+    if header.ground_level is None:
+        raise GEFParsingException("The GEF file has no ground level (#ZID)")
+
+    if FRICTION_RATIO in header.columns:
+        rf = column(FRICTION_RATIO) / 100
+    elif LOCAL_FRICTION in header.columns:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rf = np.where(qc > 0, column(LOCAL_FRICTION) / qc, np.nan)
+    else:
+        raise GEFParsingException("The GEF file needs a friction ratio or local friction column")
+
+    columns = {'elevation': (header.ground_level - np.abs(depth)) * 1e3, 'qc': qc, 'Rf': rf}
+    for name in additional_columns:
+        quantity = ADDITIONAL_COLUMN_QUANTITIES.get(name)
+        if quantity in header.columns:
+            columns[name] = column(quantity)
+    return columns
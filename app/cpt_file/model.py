@@ -15,15 +15,172 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 SOFTWARE.
 """
 
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
 from munch import unmunchify
 
 from viktor.geo import GEFData
+from .derived import compute_derived_data
+from .derived import is_current
+from .serialization import decode_column
+from .serialization import decode_measurement_data
+
+
+def _to_column(measurement_data: dict, name: str, scale: float = 1.0) -> np.ndarray:
+    """Decode a measurement column to a contiguous, read-only float64 array with NaN for missing values"""
+    column = decode_column(measurement_data, name)
+    if scale != 1.0:
+        column *= scale
+    column = np.ascontiguousarray(column)
+    column.setflags(write=False)
+    return column
 
 
 class CPT:
-    """"CPT model used for visualizing the soil layout"""
-    def __init__(self, cpt_params, **kwargs):
-        params = unmunchify(cpt_params)
-        self.params = params
-        self.parsed_cpt = GEFData(self.params)
-        self.name = params['headers']['name']
+    """"CPT model used for visualizing the soil layout
+
+    The measurement columns are exposed as NumPy arrays in plotting units (elevation in m, qc in MPa, Rf in %). They
+    are converted on first access and memoized, so repeated traces of the same CPT do not convert the data again.
+    The derived quantities (qt, Fr, Ic and the layers) are read from the params, they are only recomputed when they
+    were stored by an older version of the app. The recomputed quantities are kept in the `cache` (a CPTCache), if any.
+    """
+    __slots__ = ('_raw_params', '_params', '_parsed_cpt', 'name', 'key', '_elevation', '_qc', '_rf', '_extent',
+                 '_derived_data', '_derived_columns', '_cache')
+
+    def __init__(self, cpt_params, columns: Dict[str, np.ndarray] = None, key: str = None, cache=None, **kwargs):
+        self._raw_params = cpt_params
+        self.key = key
+        self._cache = cache
+        self._params: Optional[dict] = None
+        self._parsed_cpt: Optional[GEFData] = None
+        self.name = cpt_params['headers']['name']
+        self._elevation: Optional[np.ndarray] = None
+        self._qc: Optional[np.ndarray] = None
+        self._rf: Optional[np.ndarray] = None
+        self._extent: Optional[Tuple[float, float]] = None
+        self._derived_data: Optional[dict] = None
+        self._derived_columns: Dict[str, np.ndarray] = {}
+        if columns is not None:
+            self._elevation, self._qc, self._rf = columns['elevation'], columns['qc'], columns['rf']
+
+    def __getstate__(self) -> dict:
+        """
+        State for pickling, e.g. to render in a process pool. The cache (which holds a lock) stays behind, the GEFData
+        object is rebuilt on use.
+        """
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['_cache'] = None
+        state['_parsed_cpt'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def params(self) -> dict:
+        """Plain dictionary of the CPT params"""
+        if self._params is None:
+            self._params = unmunchify(self._raw_params)
+            self._params['measurement_data'] = decode_measurement_data(self._params['measurement_data'])
+        return self._params
+
+    @property
+    def parsed_cpt(self) -> GEFData:
+        """GEFData object of the CPT, only built when it is actually used"""
+        if self._parsed_cpt is None:
+            self._parsed_cpt = GEFData(self.params)
+        return self._parsed_cpt
+
+    @property
+    def measurement_data(self) -> dict:
+        """Measurement data as stored in the params, in the binary column or the list format"""
+        return self._raw_params['measurement_data']
+
+    @property
+    def elevation(self) -> np.ndarray:
+        """Elevation w.r.t. the reference level [m]"""
+        if self._elevation is None:
+            self._elevation = _to_column(self.measurement_data, 'elevation', scale=1e-3)
+        return self._elevation
+
+    @property
+    def qc(self) -> np.ndarray:
+        """Cone resistance [MPa]"""
+        if self._qc is None:
+            self._qc = _to_column(self.measurement_data, 'qc')
+        return self._qc
+
+    @property
+    def rf(self) -> np.ndarray:
+        """Friction number [%]"""
+        if self._rf is None:
+            self._rf = _to_column(self.measurement_data, 'Rf', scale=100)
+        return self._rf
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Prepared measurement columns, in the format accepted by the `columns` argument"""
+        return {'elevation': self.elevation, 'qc': self.qc, 'rf': self.rf}
+
+    @property
+    def extent(self) -> Tuple[float, float]:
+        """Lowest and highest measured elevation [m], NaN if the CPT has no elevation data"""
+        if self._extent is None:
+            if np.isfinite(self.elevation).any():
+                self._extent = (float(np.nanmin(self.elevation)), float(np.nanmax(self.elevation)))
+            else:
+                self._extent = (np.nan, np.nan)
+        return self._extent
+
+    @property
+    def derived_data(self) -> dict:
+        """
+        Stored derived quantities of the CPT, recomputed on first access when they are missing or outdated. Recomputed
+        data is kept in the cache under the content hash, so it is only computed once per worker.
+        """
+        if self._derived_data is None:
+            stored = self._raw_params.get('derived_data')
+            if is_current(stored):
+                self._derived_data = stored
+            else:
+                cached = self._cache is not None and self.key is not None
+                self._derived_data = self._cache.get_derived(self.key) if cached else None
+                if self._derived_data is None:
+                    self._derived_data = compute_derived_data(self.measurement_data, self._raw_params['headers'])
+                    if cached:
+                        self._cache.put_derived(self.key, self._derived_data)
+        return self._derived_data
+
+    def _derived_column(self, name: str) -> np.ndarray:
+        if name not in self._derived_columns:
+            self._derived_columns[name] = _to_column(self.derived_data['columns'], name)
+        return self._derived_columns[name]
+
+    @property
+    def qt(self) -> np.ndarray:
+        """Corrected cone resistance [MPa]"""
+        return self._derived_column('qt')
+
+    @property
+    def normalized_friction_ratio(self) -> np.ndarray:
+        """Normalized friction ratio Fr [%]"""
+        return self._derived_column('Fr')
+
+    @property
+    def ic(self) -> np.ndarray:
+        """Soil behaviour type index Ic [-]"""
+        return self._derived_column('Ic')
+
+    @property
+    def layers(self) -> Dict[str, np.ndarray]:
+        """Top and bottom elevation [m] and soil behaviour type zone of the layers, from top to bottom"""
+        layers = self.derived_data['layers']
+        return {
+            'top': np.array(layers['top'], dtype=np.float64) * 1e-3,
+            'bottom': np.array(layers['bottom'], dtype=np.float64) * 1e-3,
+            'zone': np.array(layers['zone'], dtype=np.int64),
+        }
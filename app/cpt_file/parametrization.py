@@ -4,3 +4,5 @@ from viktor.parametrization import Parametrization, HiddenField
 class CPTParametrization(Parametrization):
     headers = HiddenField('headers')
     measurement_data = HiddenField('measurement_data')
+    derived_data = HiddenField('derived_data')
+    content_hash = HiddenField('content_hash')
@@ -0,0 +1,88 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import List
+from typing import Optional
+from typing import TextIO
+
+import numpy as np
+from viktor.geo import GEFFile
+from .derived import compute_derived_data
+from .gef_reader import measurement_columns
+from .gef_reader import read_gef_data
+from .gef_reader import read_gef_header
+from .serialization import content_hash
+from .serialization import encode_measurement_data
+
+ADDITIONAL_COLUMNS: List[str] = []
+STREAMING_ROW_THRESHOLD = 250000
+
+
+def final_depth(elevation) -> Optional[float]:
+    """
+    Lowest measured elevation [mm], stored in the headers so the CPT Files of a project can be listed on the map without
+    decoding their measurement data. Rounded to 0.1 mm like the layers, so the stored value does not depend on the
+    rounding of the parser. None if the CPT has no elevation data.
+    """
+    elevation = np.asarray(elevation, dtype=np.float64)
+    return round(float(np.nanmin(elevation)), 1) if np.isfinite(elevation).any() else None
+
+
+def parse_gef(file_content: str, additional_columns: List[str] = None, file_name: str = None) -> dict:
+    """
+    Parse the content of a GEF file to the params of a CPTFile entity. Raises a GEFParsingException if the file can
+    not be parsed. Used by both the single file upload and the bulk import, so it must stay picklable (module level).
+    The measurement data is stored in the compact binary column format, the derived quantities are computed once and
+    stored next to it. A CPT without a name is named after `file_name`.
+    """
+    if additional_columns is None:
+        additional_columns = ADDITIONAL_COLUMNS
+    cpt_file = GEFFile(file_content)
+    cpt_data_object = cpt_file.parse(additional_columns=additional_columns, return_gef_data_obj=True)
+    cpt_params = cpt_data_object.serialize()
+    if not cpt_params['headers'].get('name'):
+        cpt_params['headers']['name'] = file_name
+    cpt_params['headers']['final_depth_wrt_reference'] = final_depth(cpt_params['measurement_data']['elevation'])
+    cpt_params['derived_data'] = compute_derived_data(cpt_params['measurement_data'], cpt_params['headers'])
+    cpt_params['measurement_data'] = encode_measurement_data(cpt_params['measurement_data'])
+    cpt_params['content_hash'] = content_hash(cpt_params['headers'], cpt_params['measurement_data'])
+    return cpt_params
+
+
+def parse_gef_stream(stream: TextIO, additional_columns: List[str] = None, file_name: str = None) -> dict:
+    """
+    Parse a GEF file from a text stream to the params of a CPTFile entity. The header is read first; files with more
+    than STREAMING_ROW_THRESHOLD rows, or an unknown number of rows (no #LASTSCAN), are read in chunks straight into
+    NumPy columns, so the memory use stays proportional to the measurement data instead of several copies of the file
+    text. Other files are parsed with GEFFile as in `parse_gef`. The streamed headers only contain the fields that the
+    app uses, see `GEFHeader.headers`.
+    """
+    if additional_columns is None:
+        additional_columns = ADDITIONAL_COLUMNS
+    header = read_gef_header(stream)
+    if header.last_scan is not None and header.last_scan <= STREAMING_ROW_THRESHOLD:
+        return parse_gef(header.text + stream.read(), additional_columns, file_name)
+
+    columns = measurement_columns(header, read_gef_data(stream, header), additional_columns)
+    headers = header.headers(file_name)
+    headers['final_depth_wrt_reference'] = final_depth(columns['elevation'])
+    measurement_data = encode_measurement_data(columns)
+    return {
+        'headers': headers,
+        'measurement_data': measurement_data,
+        'derived_data': compute_derived_data(columns, headers),
+        'content_hash': content_hash(headers, measurement_data),
+    }
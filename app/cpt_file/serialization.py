@@ -0,0 +1,122 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import base64
+import hashlib
+import json
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional, zlib is always available
+    zstandard = None
+
+SCHEMA_VERSION = 1
+DEFAULT_DTYPE = '<f4'
+DEFAULT_COMPRESSION = 'zlib'
+SUPPORTED_DTYPES = ('<f4', '<f8')
+
+
+def is_encoded(measurement_data: dict) -> bool:
+    """True if the measurement data is stored in the binary column format, False for the plain list format"""
+    return 'schema_version' in measurement_data
+
+
+def encode_measurement_data(measurement_data: dict, dtype: str = DEFAULT_DTYPE,
+                            compression: str = DEFAULT_COMPRESSION) -> dict:
+    """
+    Encode measurement data columns (lists of numbers, None for missing values) as base64 strings of little-endian
+    float blocks, optionally compressed with 'zlib' or 'zstd'. Missing values are stored as NaN.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype}, use one of {SUPPORTED_DTYPES}")
+    columns = {}
+    for name, values in measurement_data.items():
+        block = np.array(values, dtype=np.float64).astype(dtype).tobytes()
+        columns[name] = base64.b64encode(_compress(block, compression)).decode('ascii')
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'dtype': dtype,
+        'compression': compression,
+        'columns': columns,
+    }
+
+
+def content_hash(headers: dict, measurement_data: dict) -> str:
+    """
+    Hash of the headers and measurement data of a cpt. Encoded measurement data is hashed as stored, data in the list
+    format is hashed as float64 columns, which is much cheaper than serializing the lists.
+    """
+    digest = hashlib.blake2b(json.dumps(headers, sort_keys=True, default=str).encode(), digest_size=16)
+    if is_encoded(measurement_data):
+        digest.update(json.dumps(measurement_data, sort_keys=True).encode())
+    else:
+        for name in sorted(measurement_data):
+            digest.update(name.encode())
+            digest.update(np.array(measurement_data[name], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def decode_column(measurement_data: dict, name: str) -> np.ndarray:
+    """Float64 array of a measurement data column with NaN for missing values, for both storage formats"""
+    if not is_encoded(measurement_data):
+        return np.array(measurement_data[name], dtype=np.float64)
+    if measurement_data['schema_version'] > SCHEMA_VERSION:
+        raise ValueError(f"Measurement data schema version {measurement_data['schema_version']} is not supported")
+    block = _decompress(base64.b64decode(measurement_data['columns'][name]), measurement_data['compression'])
+    return np.frombuffer(block, dtype=measurement_data['dtype']).astype(np.float64)
+
+
+def decode_measurement_data(measurement_data: dict) -> dict:
+    """
+    Measurement data in the plain list format (None for missing values), as expected by GEFData. Float32 values are
+    converted to the shortest decimal that rounds to them, so 1.2 is decoded as 1.2 instead of 1.2000000476837158.
+    """
+    if not is_encoded(measurement_data):
+        return measurement_data
+    decoded = {}
+    for name in measurement_data['columns']:
+        column = decode_column(measurement_data, name)
+        if np.dtype(measurement_data['dtype']) == np.float32:
+            column = column.astype(np.float32).astype(str).astype(np.float64)
+        decoded[name] = np.where(np.isnan(column), None, column).tolist()
+    return decoded
+
+
+def _compress(block: bytes, compression: str) -> bytes:
+    if compression == 'none':
+        return block
+    if compression == 'zlib':
+        return zlib.compress(block, 6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor().compress(block)
+    raise ValueError(f"Unsupported compression {compression}")
+
+
+def _decompress(block: bytes, compression: str) -> bytes:
+    if compression == 'none':
+        return block
+    if compression == 'zlib':
+        return zlib.decompress(block)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("Decoding zstd compressed measurement data requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(block)
+    raise ValueError(f"Unsupported compression {compression}")
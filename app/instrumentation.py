@@ -0,0 +1,199 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextlib import nullcontext
+from contextvars import ContextVar
+from html import escape
+from typing import Dict
+from typing import List
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('CPT_INSTRUMENTATION', '') == '1'
+TRACE_MEMORY = os.environ.get('CPT_INSTRUMENTATION_MEMORY', '') == '1'
+DEBUG_PANEL = os.environ.get('CPT_INSTRUMENTATION_PANEL', '') == '1'
+PROFILE = os.environ.get('CPT_PROFILE', '') == '1'
+PROFILE_INTERVAL = float(os.environ.get('CPT_PROFILE_INTERVAL', 0.005))  # s
+PROFILE_TOP = 15
+
+if ENABLED and not logger.handlers:
+    # The records are logged at INFO level, which the default WARNING level would drop; one JSON record per line
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    logger.propagate = False
+
+_NO_STAGE = nullcontext()
+_current_request: ContextVar[Optional['RequestTimings']] = ContextVar('current_request', default=None)
+
+
+class StageTiming:
+    __slots__ = ('calls', 'seconds', 'peak_memory')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.
+        self.peak_memory = 0
+
+
+class RequestTimings:
+    """Timings of the stages of one request, aggregated per stage name in order of first use"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: Dict[str, StageTiming] = {}
+        self.seconds = 0.
+        self.profile: List[str] = []
+
+    def as_record(self) -> dict:
+        return {
+            'request': self.name,
+            'seconds': round(self.seconds, 6),
+            'stages': {name: {'calls': stage.calls, 'seconds': round(stage.seconds, 6),
+                              **({'peak_memory': stage.peak_memory} if TRACE_MEMORY else {})}
+                       for name, stage in self.stages.items()},
+            **({'profile': self.profile} if self.profile else {}),
+        }
+
+    def as_html(self) -> str:
+        """Debug panel with the stage timings, to be added to the html of a view"""
+        rows = ''.join(
+            f"<tr><td>{escape(name)}</td><td>{stage.calls}</td><td>{stage.seconds * 1e3:.1f}</td>"
+            f"<td>{stage.peak_memory / 1e6:.1f}</td></tr>" for name, stage in self.stages.items()
+        )
+        profile = f"<pre>{escape(chr(10).join(self.profile))}</pre>" if self.profile else ''
+        return (
+            '<details style="font:12px monospace;margin:8px"><summary>'
+            f'{escape(self.name)}: {self.seconds * 1e3:.1f} ms</summary>'
+            '<table><tr><th>stage</th><th>calls</th><th>ms</th><th>peak MB</th></tr>'
+            f'{rows}</table>{profile}</details>'
+        )
+
+
+class _Stage:
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+        self.start = 0.
+
+    def __enter__(self):
+        if TRACE_MEMORY:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        stage = self.timings.stages.get(self.name)
+        if stage is None:
+            stage = self.timings.stages[self.name] = StageTiming()
+        stage.calls += 1
+        stage.seconds += duration
+        if TRACE_MEMORY:
+            stage.peak_memory = max(stage.peak_memory, tracemalloc.get_traced_memory()[1])
+
+
+def stage(name: str):
+    """
+    Context manager that adds the duration of the block to stage `name` of the current request. Without an
+    instrumented request (the default) a shared no-op context manager is returned.
+    """
+    timings = _current_request.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(timings, name)
+
+
+def timed(name: str):
+    """Decorator version of `stage`"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_request() -> Optional[RequestTimings]:
+    return _current_request.get()
+
+
+@contextmanager
+def instrumented_request(name: str):
+    """
+    Collect the stage timings of a request and log them as one JSON record. Only active when the environment variable
+    CPT_INSTRUMENTATION=1 is set. CPT_INSTRUMENTATION_MEMORY=1 adds tracemalloc peak memory per stage (which slows
+    down the request considerably, and is approximate for nested stages because every stage resets the peak) and
+    CPT_PROFILE=1 samples the call stack of the request.
+    """
+    if not ENABLED:
+        yield None
+        return
+
+    timings = RequestTimings(name)
+    token = _current_request.set(timings)
+    started_tracing = TRACE_MEMORY and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = _SamplingProfiler(threading.get_ident()) if PROFILE else None
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings.seconds = time.perf_counter() - start
+        if profiler is not None:
+            timings.profile = profiler.stop()
+        if started_tracing:
+            tracemalloc.stop()
+        _current_request.reset(token)
+        logger.info(json.dumps(timings.as_record()))
+
+
+class _SamplingProfiler:
+    """Samples the innermost frame of a thread at a fixed interval from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            if frame is not None:
+                self.samples[f"{frame.f_code.co_filename}:{frame.f_lineno} {frame.f_code.co_name}"] += 1
+
+    def stop(self) -> List[str]:
+        """Stop sampling and return the most sampled locations"""
+        self._stopped.set()
+        self._thread.join()
+        total = sum(self.samples.values()) or 1
+        return [f"{count / total:6.1%} {location}" for location, count in self.samples.most_common(PROFILE_TOP)]
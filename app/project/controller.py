@@ -14,44 +14,218 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+import logging
+import os
+from io import BytesIO
 from io import StringIO
 
+import numpy as np
 from munch import Munch
+from plotly import graph_objects as go
 
+from viktor import Color
 from viktor import UserError
 from viktor import ViktorController
+from viktor.api_v1 import API
 from viktor.core import progress_message
+from viktor.geometry import GeoPoint
+from viktor.result import DownloadResult
+from viktor.views import MapEntityLink
+from viktor.views import MapLegend
+from viktor.views import MapPoint
+from viktor.views import MapPolygon
+from viktor.views import MapResult
+from viktor.views import ImageResult
+from viktor.views import ImageView
+from viktor.views import MapView
+from viktor.views import PlotlyResult
+from viktor.views import PlotlyView
 from viktor.views import WebResult
 from viktor.views import WebView
+from .cpt_comparison_helper_functions import comparison_options
 from .cpt_comparison_helper_functions import visualize_multiple_cpts_in_graph
+from .fetching import fetch_cpts
+from .figure_builder import get_figure_builder
+from .html_rendering import figure_to_html
+from .image_rendering import cached_render
 from .parametrization import ProjectParametrization
-from ..cpt_file.model import CPT
+from .similarity import similarity_matrix
+from .spatial_index import CPTLocationIndex
+from .spatial_index import DEFAULT_NEAREST_COUNT
+from .spatial_index import get_location_index
+from ..cpt_file.bulk_import import parse_gef_archive
+from ..cpt_file.cache import get_cache
+from ..cpt_file.controller import CPT_ENTITY_TYPES
+from ..instrumentation import DEBUG_PANEL
+from ..instrumentation import instrumented_request
+from ..instrumentation import stage
+
+logger = logging.getLogger(__name__)
 
 
 class ProjectController(ViktorController):
     """Controller class which acts as interface for the Sample entity type."""
     label = "Project"
-    children = ['CPTFile']
+    children = CPT_ENTITY_TYPES
     show_children_as = 'Table'
     parametrization = ProjectParametrization(width=20)
 
     @WebView('Compare CPTs', duration_guess=5)
-    def compare_cpts(self, params: Munch, **kwargs) -> WebResult:
+    def compare_cpts(self, params: Munch, entity_id: int = None, **kwargs) -> WebResult:
         """Visualizes multiple cpt that is selected in an optionfield, for comparing"""
-        progress_message("Gathering CPTs to add to comparison")
-        cpts = self.get_all_cpts(params)
-        figure = visualize_multiple_cpts_in_graph(cpts=cpts, single_graph=params.single_graph)
+        with instrumented_request('compare_cpts') as timings:
+            progress_message("Gathering CPTs to add to comparison")
+            cpts = self.get_all_cpts(params, entity_id)
+            options = comparison_options(params)
+            with stage('build_figure'):
+                figure = visualize_multiple_cpts_in_graph(cpts=cpts, webgl=params.webgl,
+                                                          builder=get_figure_builder(entity_id, options['max_points']),
+                                                          **options)
+            with stage('to_html'):
+                html = figure_to_html(figure, webgl=params.webgl)
+
+        if timings is not None and DEBUG_PANEL:
+            html = html.replace('</body>', f'{timings.as_html()}</body>', 1)
+        return WebResult(html=StringIO(html))
+
+    @ImageView('Comparison image', duration_guess=10)
+    def comparison_image(self, params: Munch, entity_id: int = None, **kwargs) -> ImageResult:
+        """Static image of the comparison, for reports"""
+        image = self.render_comparison_image(params, entity_id)
+        if params.image_format == 'svg':
+            return ImageResult(StringIO(image.decode()))
+        return ImageResult(BytesIO(image))
+
+    @staticmethod
+    def download_comparison_image(params: Munch, entity_id: int = None, **kwargs) -> DownloadResult:
+        """Download the static image of the comparison"""
+        image = ProjectController.render_comparison_image(params, entity_id)
+        return DownloadResult(image, f'cpt_comparison.{params.image_format}')
+
+    @staticmethod
+    def render_comparison_image(params: Munch, entity_id: int = None) -> bytes:
+        """Render the comparison to a PNG or SVG image, reusing the image of an earlier render of the same cpts"""
+        with instrumented_request('comparison_image'):
+            progress_message("Gathering CPTs to add to comparison")
+            cpts = ProjectController.get_all_cpts(params, entity_id)
+            with stage('render_image'):
+                try:
+                    return cached_render(cpts, comparison_options(params), params.image_format)
+                except ValueError as error:
+                    raise UserError(str(error)) from error
+
+    @PlotlyView('Similarity', duration_guess=5)
+    def similarity(self, params: Munch, entity_id: int = None, **kwargs) -> PlotlyResult:
+        """Heatmap of a similarity metric between all pairs of selected cpts"""
+        with instrumented_request('similarity'):
+            progress_message("Gathering CPTs to add to comparison")
+            cpts = self.get_all_cpts(params, entity_id)
+            progress_message(f"Computing {params.similarity_metric} between {len(cpts)} CPTs")
+            with stage('similarity_matrix'):
+                matrix = similarity_matrix(cpts, params.similarity_metric)
+
+        names = [cpt.name for cpt in cpts]
+        figure = go.Figure(go.Heatmap(z=matrix, x=names, y=names, colorscale='Viridis',
+                                      colorbar=dict(title=params.similarity_metric)))
+        figure.update_yaxes(autorange='reversed')
+        figure.update_layout(template='plotly_white', title=params.similarity_metric)
+        return PlotlyResult(figure.to_json())
+
+    @MapView('Map', duration_guess=2)
+    def map(self, params: Munch, entity_id: int, **kwargs) -> MapResult:
+        """Locations of the CPTs in the project, with the CPTs that are selected for comparison highlighted"""
+        index = get_location_index(entity_id)
+        index.refresh(API().get_entity(entity_id))
+        if params.selection_mode not in ('Nearest to point', 'Within polygon'):
+            selected_ids = {cpt.id for cpt in params.selected_cpts or []}
+        elif params.map_point if params.selection_mode == 'Nearest to point' else params.map_polygon:
+            selected_ids = {location.entity_id for location in self.get_selected_cpt_locations(params, index)}
+        else:
+            # Nothing is highlighted until the point or polygon is drawn, which is done on this map
+            selected_ids = set()
+
+        features = []
+        for location in index.locations.values():
+            if not (np.isfinite(location.x) and np.isfinite(location.y)):
+                continue
+            description = f"Ground level: {location.ground_level:.2f} m, final depth: {location.bottom:.2f} m"
+            features.append(MapPoint.from_geo_point(
+                GeoPoint.from_rd((location.x, location.y)), title=location.name, description=description,
+                color=Color.red() if location.entity_id in selected_ids else Color.viktor_blue(),
+                entity_links=[MapEntityLink(location.name, location.entity_id)]
+            ))
+        if params.selection_mode == 'Nearest to point' and params.map_point:
+            features.append(MapPoint.from_geo_point(params.map_point, color=Color.black()))
+        if params.selection_mode == 'Within polygon' and params.map_polygon:
+            features.append(MapPolygon.from_geo_polygon(params.map_polygon, color=Color.black()))
 
-        return WebResult(html=StringIO(figure.to_html()))
+        legend = MapLegend([(Color.red(), 'Selected for comparison'), (Color.viktor_blue(), 'CPT')])
+        return MapResult(features, legend=legend)
 
     @staticmethod
-    def get_all_cpts(params):
+    def get_selected_cpt_locations(params: Munch, index: CPTLocationIndex) -> list:
+        """The locations of the CPT Files that are selected with a query on the map"""
+        if params.selection_mode == 'Nearest to point':
+            if not params.map_point:
+                raise UserError('Please select a point on the map')
+            return index.nearest(*params.map_point.rd, k=params.nearest_count or DEFAULT_NEAREST_COUNT)
+        if not params.map_polygon:
+            raise UserError('Please draw a polygon on the map')
+        return index.within_polygon([point.rd for point in params.map_polygon.points])
+
+    @staticmethod
+    def get_selected_cpt_entities(params: Munch, entity_id: int = None) -> list:
+        """The CPT File entities that are selected for comparison, from the list or with a query on the map"""
+        if params.selection_mode not in ('Nearest to point', 'Within polygon'):
+            return list(params.selected_cpts or [])
+
+        project = API().get_entity(entity_id)
+        index = get_location_index(entity_id)
+        index.refresh(project)
+        locations = ProjectController.get_selected_cpt_locations(params, index)
+        if not locations:
+            return []
+
+        # Only the params of the selected CPT Files are retrieved, by fetch_cpts
+        children = {child.id: child for child in
+                    project.children(include_params=False, entity_type_names=CPT_ENTITY_TYPES)}
+        return [children[location.entity_id] for location in locations if location.entity_id in children]
+
+    @staticmethod
+    def get_all_cpts(params, entity_id: int = None):
         """"retrieve params from selected cpts and create new cpt objects"""
-        if not params.selected_cpts:
+        with stage('select_cpts'):
+            selected_cpts = ProjectController.get_selected_cpt_entities(params, entity_id)
+        if not selected_cpts:
             raise UserError('Please select CPTs for comparison')
 
-        cpts = []
-        for cpt in params.selected_cpts:
-            cpts.append(CPT(cpt.last_saved_params))
+        cpts, errors = fetch_cpts(selected_cpts)
+        logger.info("CPT cache statistics: %s", get_cache().stats)
+        if errors:
+            raise UserError('Could not retrieve all selected CPTs:\n' + '\n'.join(errors))
 
         return cpts
+
+    @staticmethod
+    def import_gef_archive(params: Munch, entity_id: int, **kwargs) -> DownloadResult:
+        """Create an Imported CPT File for every GEF file in the uploaded zip archive and return a report of the import"""
+        if not params.gef_archive:
+            raise UserError('Please upload a zip archive with GEF files')
+
+        progress_message("Parsing GEF files")
+        parsed_files, errors = parse_gef_archive(BytesIO(params.gef_archive.file.getvalue_binary()))
+
+        project = API().get_entity(entity_id)
+        total = len(parsed_files) + len(errors)
+        imported = 0
+        for i, (name, cpt_params) in enumerate(parsed_files.items()):
+            progress_message(f"Creating CPT {os.path.basename(name)}", percentage=(i / len(parsed_files) * 100))
+            try:
+                project.create_child('ImportedCPTFile', os.path.basename(name), params=cpt_params)
+                imported += 1
+            except Exception as error:  # pylint: disable=broad-except
+                errors[name] = str(error)
+
+        report = [f"Imported {imported} of {total} GEF files"]
+        report += [f"Failed {name}: {error}" for name, error in errors.items()]
+        return DownloadResult('\n'.join(report) + '\n', 'gef_import_report.txt')
@@ -14,28 +14,83 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import sys
+from functools import lru_cache
 from itertools import cycle
 from math import ceil
 from math import floor
 from typing import List
+from typing import Optional
+from typing import Tuple
 
+from munch import Munch
 import plotly as plt
 from plotly import graph_objects as go
 from plotly.subplots import make_subplots
 
 from viktor.core import progress_message
+from .envelope import DepthEnvelope
+from .envelope import depth_envelope
+from .figure_builder import IncrementalFigureBuilder
+from .figure_builder import TraceData
+from ..cpt_file.derived import SBT_ZONE_BOUNDARIES
 from ..cpt_file.model import CPT
+from ..instrumentation import stage
+from ..instrumentation import timed
 
+DEFAULT_MAX_POINTS_PER_TRACE = 2000
+DEFAULT_PAGE_SIZE = 10
 
-def visualize_multiple_cpts_in_graph(cpts: List[CPT], single_graph: bool = False) -> go.Figure:
-    """"Plot the Qc and rf signal for cpts. This can be plotted in a single or multiple plots."""
+
+def comparison_options(params: Munch) -> dict:
+    """
+    The options of a Project that determine the comparison figure, as keyword arguments of the figure function. The
+    page is only included when the multiple graphs are paged, so other figures share their render key for all pages.
+    Cleared fields fall back to their default.
+    """
+    options = {
+        'single_graph': bool(params.single_graph),
+        'envelope': bool(params.envelope),
+        'show_ic': bool(params.show_ic),
+        'max_points': None if params.full_resolution else params.max_points_per_trace or DEFAULT_MAX_POINTS_PER_TRACE,
+    }
+    if params.paged and not params.single_graph and not params.envelope:
+        options['page_size'] = params.page_size or DEFAULT_PAGE_SIZE
+        options['page'] = params.page or 1
+    return options
+
+
+def visualize_multiple_cpts_in_graph(cpts: List[CPT], single_graph: bool = False,
+                                     max_points: Optional[int] = DEFAULT_MAX_POINTS_PER_TRACE,
+                                     webgl: bool = False, builder: IncrementalFigureBuilder = None,
+                                     envelope: bool = False, show_ic: bool = False, page_size: Optional[int] = None,
+                                     page: int = 1) -> go.Figure:
+    """"Plot the Qc and rf signal for cpts. This can be plotted in a single or multiple plots.
+
+    The signals are downsampled to about `max_points` points per trace, `max_points=None` plots every sample.
+    With `webgl=True` the traces are rendered with WebGL (Scattergl) instead of SVG. A `builder` that is kept between
+    calls only prepares the trace data of cpts that were added to the selection since the previous call.
+    With `envelope=True` the statistical envelope of all cpts is plotted instead of the individual signals.
+    With `show_ic=True` the precomputed soil behaviour type index is plotted next to the Qc and Rf signal.
+    With a `page_size` the multiple plots are split in pages of `page_size` cpts and only page `page` (1-based) is
+    plotted, on the shared elevation range of the whole selection.
+    """
+    scatter = go.Scattergl if webgl else go.Scatter
+    if envelope:
+        return __visualize_cpts_envelope(cpts, scatter, show_ic)
+    if builder is None:
+        builder = IncrementalFigureBuilder(max_points)
+    with stage('trace_data'):
+        traces, elevation_range = builder.update(cpts, show_ic)
     if single_graph:
-        return __visualize_multiple_cpts_in_single_graph(cpts)
-    return __visualize_multiple_cpts_in_multiple_graphs(cpts)
+        return __visualize_multiple_cpts_in_single_graph(traces, elevation_range, scatter, show_ic)
+    if page_size:
+        return __visualize_page_of_cpts_in_multiple_graphs(traces, elevation_range, page_size, page, scatter, show_ic)
+    return __visualize_multiple_cpts_in_multiple_graphs(traces, elevation_range, scatter, show_ic)
 
 
-def __visualize_multiple_cpts_in_single_graph(cpts: List[CPT]) -> go.Figure:
+@timed('single_graph_figure')
+def __visualize_multiple_cpts_in_single_graph(cpts: List[TraceData], elevation_range: Tuple[float, float],
+                                              scatter=go.Scatter, show_ic: bool = False) -> go.Figure:
     """
     Plot the Qc signal for multiple cpts in a single graph for comparison purposes.
     In the latter case signal are added per cpt and can be switched off through the legend, the y-axis is shared.
@@ -43,95 +98,113 @@ def __visualize_multiple_cpts_in_single_graph(cpts: List[CPT]) -> go.Figure:
     color_cycle = cycle(plt.colors.qualitative.G10)
 
     # make subplots
-    fig = make_subplots(rows=1, cols=2, shared_yaxes=True,
-                        subplot_titles=("cone resistance", "friction number"))
+    fig = make_subplots(rows=1, cols=3 if show_ic else 2, shared_yaxes=True,
+                        subplot_titles=("cone resistance", "friction number", "soil behaviour type index"))
 
+    # The traces are cached per cpt and added at once, which is much faster than adding them one by one
+    traces, columns = [], []
     for i, cpt in enumerate(cpts):
         progress_message(f"Adding cpt {cpt.name} to comparison", percentage=(i / len(cpts) * 100))
         selected_color = next(color_cycle)
 
         # Plot the Qc signal
-        fig.add_trace(
-            go.Scatter(name=f'Qc {cpt.name}',
-                       hovertext=f'{cpt.name}',
-                       x=cpt.parsed_cpt.qc,
-                       y=[el * 1e-3 if el else el for el in cpt.parsed_cpt.elevation],
-                       mode='lines',
-                       line=dict(color=selected_color, width=1.25),
-                       legendgroup=f'{cpt.name}'),
-            row=1, col=1
-        )
+        traces.append(cpt.trace(scatter, 'qc',
+                                name=f'Qc {cpt.name}',
+                                hovertext=f'{cpt.name}',
+                                mode='lines',
+                                line=dict(color=selected_color, width=1.25),
+                                legendgroup=f'{cpt.name}'))
+        columns.append(1)
 
         # Draw resistance if requested
-        fig.add_trace(
-            go.Scatter(name=f'Rf {cpt.name}',
-                       hovertext=f'{cpt.name}',
-                       x=[rfval * 100 if rfval else rfval for rfval in cpt.parsed_cpt.Rf],
-                       y=[el * 1e-3 if el else el for el in cpt.parsed_cpt.elevation],
-                       mode='lines',
-                       line=dict(color=selected_color, width=1.25),
-                       legendgroup=f'{cpt.name}'),
-            row=1, col=2
-        )
+        traces.append(cpt.trace(scatter, 'rf',
+                                name=f'Rf {cpt.name}',
+                                hovertext=f'{cpt.name}',
+                                mode='lines',
+                                line=dict(color=selected_color, width=1.25),
+                                legendgroup=f'{cpt.name}'))
+        columns.append(2)
+
+        if show_ic:
+            traces.append(cpt.trace(scatter, 'ic',
+                                    name=f'Ic {cpt.name}',
+                                    hovertext=f'{cpt.name}',
+                                    mode='lines',
+                                    line=dict(color=selected_color, width=1.25),
+                                    legendgroup=f'{cpt.name}'))
+            columns.append(3)
+    fig.add_traces(traces, rows=[1] * len(traces), cols=columns)
 
     # Format axes and grids per subplot
     standard_grid_options = dict(showgrid=True, gridwidth=1, gridcolor='DarkGrey')
     standard_line_options = dict(showline=True, linewidth=2, linecolor='DarkGrey')
+    bottom, _ = elevation_range
 
     fig.update_xaxes(row=1, col=1, **standard_line_options, **standard_grid_options,
                      range=[0, 30], tick0=0, dtick=1, title_text="Qc [MPa]")
     fig.update_yaxes(row=1, col=1, **standard_grid_options, title_text="Depth [m] w.r.t. NAP",
-                     tick0=floor(min([cpt.parsed_cpt.elevation[-1] if cpt.parsed_cpt.elevation[-1] else sys.float_info.max for cpt in cpts]) / 1e3) - 5, dtick=1)
+                     tick0=floor(bottom) - 5, dtick=1)
     fig.update_xaxes(row=1, col=2, **standard_line_options, **standard_grid_options,
                      range=[10, 0], tick0=0, dtick=1, title_text="Rf [%]")
     fig.update_yaxes(row=1, col=2, **standard_grid_options,
-                     tick0=floor(min([cpt.parsed_cpt.elevation[-1] if cpt.parsed_cpt.elevation[-1] else sys.float_info.max for cpt in cpts]) / 1e3) - 5, dtick=1)
+                     tick0=floor(bottom) - 5, dtick=1)
+    if show_ic:
+        __format_ic_axes(fig, row=1, col=3)
 
     fig.update_layout(template='plotly_white')  # Forces white background
 
     return fig
 
 
-def __visualize_multiple_cpts_in_multiple_graphs(cpts: List[CPT]) -> go.Figure:
+@timed('multiple_graphs_figure')
+def __visualize_multiple_cpts_in_multiple_graphs(cpts: List[TraceData], elevation_range: Tuple[float, float],
+                                                  scatter=go.Scatter, show_ic: bool = False) -> go.Figure:
     """
     Plot the Qc signal for multiple cpts as a collection of subplots on a horizontal layout.
     """
 
     # make subplots
-    fig = make_subplots(rows=2, cols=len(cpts), shared_yaxes=True, shared_xaxes='rows',
+    fig = make_subplots(rows=3 if show_ic else 2, cols=len(cpts), shared_yaxes=True, shared_xaxes='rows',
                         column_titles=[f'{cpt.name[:-4]}' for cpt in cpts])
 
+    # The traces are cached per cpt and added at once, which is much faster than adding them one by one
+    traces, rows, columns = [], [], []
     for i, cpt in enumerate(cpts, start=1):
         progress_message(f"Adding Qc plot for cpt {cpt.name} to comparison", percentage=((i - 1) / len(cpts) * 100))
 
         # Plot the Qc signal
-        fig.add_trace(
-            go.Scatter(
-                name=f'Qc {cpt.name}',
-                hovertext=f'{cpt.name}',
-                x=cpt.parsed_cpt.qc,
-                y=[el * 1e-3 if el else el for el in cpt.parsed_cpt.elevation],
-                mode='lines',
-                line=dict(color='mediumblue', width=1.25)),
-            row=1, col=i
-        )
+        traces.append(cpt.trace(scatter, 'qc',
+                                name=f'Qc {cpt.name}',
+                                hovertext=f'{cpt.name}',
+                                mode='lines',
+                                line=dict(color='mediumblue', width=1.25)))
+        rows.append(1)
+        columns.append(i)
 
     # Draw resistance if requested
     for i, cpt in enumerate(cpts, start=1):
         progress_message(f"Adding Rf plot for cpt {cpt.name} to comparison", percentage=((i - 1) / len(cpts) * 100))
-        fig.add_trace(
-            go.Scatter(
-                name='Friction number',
-                x=[rfval * 100 if rfval else rfval for rfval in cpt.parsed_cpt.Rf],
-                y=[el * 1e-3 if el else el for el in cpt.parsed_cpt.elevation],
-                mode='lines',
-                line=dict(color='red', width=1.25)),
-            row=2, col=i
-        )
+        traces.append(cpt.trace(scatter, 'rf',
+                                name='Friction number',
+                                mode='lines',
+                                line=dict(color='red', width=1.25)))
+        rows.append(2)
+        columns.append(i)
+
+    if show_ic:
+        for i, cpt in enumerate(cpts, start=1):
+            traces.append(cpt.trace(scatter, 'ic',
+                                    name='Soil behaviour type index',
+                                    mode='lines',
+                                    line=dict(color='darkgreen', width=1.25)))
+            rows.append(3)
+            columns.append(i)
+    fig.add_traces(traces, rows=rows, cols=columns)
 
     # Format axes and grids per subplot
     standard_grid_options = dict(showgrid=True, gridwidth=1, gridcolor='DarkGrey')
     standard_line_options = dict(showline=True, linewidth=2, linecolor='DarkGrey')
+    bottom, top = elevation_range
 
     fig.update_xaxes(
         row=1,
@@ -145,11 +218,8 @@ def __visualize_multiple_cpts_in_multiple_graphs(cpts: List[CPT]) -> go.Figure:
 
     fig.update_yaxes(
         **standard_grid_options,
-        range=[
-            floor(min([cpt.parsed_cpt.elevation[-1] for cpt in cpts]) / 1e3) - 5,
-            ceil(max([cpt.parsed_cpt.elevation[0] if cpt.parsed_cpt.elevation[0] else sys.float_info.min for cpt in cpts]) / 1e3) + 1
-        ],
-        tick0=ceil(max([cpt.parsed_cpt.elevation[0] if cpt.parsed_cpt.elevation[0] else sys.float_info.min for cpt in cpts]) / 1e3) + 1,
+        range=[floor(bottom) - 5, ceil(top) + 1],
+        tick0=ceil(top) + 1,
         dtick=1
     )
 
@@ -157,11 +227,8 @@ def __visualize_multiple_cpts_in_multiple_graphs(cpts: List[CPT]) -> go.Figure:
         col=1,
         **standard_grid_options,
         title_text="Depth [m]",
-        range=[
-            floor(min([cpt.parsed_cpt.elevation[-1] if cpt.parsed_cpt.elevation[-1] else sys.float_info.max for cpt in cpts]) / 1e3) - 5,
-            ceil(max([cpt.parsed_cpt.elevation[0] if cpt.parsed_cpt.elevation[0] else sys.float_info.min for cpt in cpts]) / 1e3) + 1
-        ],
-        tick0=ceil(max([cpt.parsed_cpt.elevation[0] if cpt.parsed_cpt.elevation[0] else sys.float_info.min for cpt in cpts]) / 1e3) + 1,
+        range=[floor(bottom) - 5, ceil(top) + 1],
+        tick0=ceil(top) + 1,
         dtick=1
     )
 
@@ -174,6 +241,8 @@ def __visualize_multiple_cpts_in_multiple_graphs(cpts: List[CPT]) -> go.Figure:
         dtick=1,
         title_text="Rf [%]"
     )
+    if show_ic:
+        __format_ic_axes(fig, row=3)
 
     # Set subplot titles to a lower fontsize, because they are usually long names
     for subplot_title in fig['layout']['annotations']:
@@ -182,3 +251,162 @@ def __visualize_multiple_cpts_in_multiple_graphs(cpts: List[CPT]) -> go.Figure:
     fig.update_layout(template='plotly_white', showlegend=False)  # Forces white background
 
     return fig
+
+
+def __add_envelope_traces(fig: go.Figure, envelope: DepthEnvelope, col: int, color: str, band_color: str,
+                          scatter=go.Scatter, showlegend: bool = True):
+    """Add the P5-P95 band, the mean +/- std band, the median and the mean of an envelope to a subplot"""
+    bands = (('P5 - P95', envelope.p5, envelope.p95, 0.15),
+             ('Mean \u00b1 std', envelope.mean - envelope.std, envelope.mean + envelope.std, 0.3))
+    for name, lower, upper, opacity in bands:
+        fig.add_trace(
+            scatter(name=name, x=lower, y=envelope.elevation, mode='lines', line=dict(width=0),
+                    legendgroup=name, showlegend=False, hoverinfo='skip'),
+            row=1, col=col
+        )
+        fig.add_trace(
+            scatter(name=name, x=upper, y=envelope.elevation, mode='lines', line=dict(width=0),
+                    fill='tonextx', fillcolor=band_color.format(opacity=opacity),
+                    legendgroup=name, showlegend=showlegend, hoverinfo='skip'),
+            row=1, col=col
+        )
+
+    fig.add_trace(
+        scatter(name='P50', x=envelope.p50, y=envelope.elevation, mode='lines', customdata=envelope.count,
+                hovertemplate='%{x:.2f} (%{customdata} CPTs)', line=dict(color=color, width=1.5),
+                legendgroup='P50', showlegend=showlegend),
+        row=1, col=col
+    )
+    fig.add_trace(
+        scatter(name='Mean', x=envelope.mean, y=envelope.elevation, mode='lines',
+                line=dict(color=color, width=1.25, dash='dash'), legendgroup='Mean', showlegend=showlegend),
+        row=1, col=col
+    )
+
+
+@timed('envelope_figure')
+def __visualize_cpts_envelope(cpts: List[CPT], scatter=go.Scatter, show_ic: bool = False) -> go.Figure:
+    """
+    Plot the statistical envelope of the Qc and Rf signal of all cpts on a shared elevation grid. The number of traces
+    and the size of the figure do not depend on the number of cpts.
+    """
+    progress_message(f"Computing the envelope of {len(cpts)} CPTs")
+    with stage('envelope'):
+        qc = depth_envelope(cpts, 'qc')
+        rf = depth_envelope(cpts, 'rf')
+        ic = depth_envelope(cpts, 'ic') if show_ic else None
+
+    # make subplots
+    fig = make_subplots(rows=1, cols=3 if show_ic else 2, shared_yaxes=True,
+                        subplot_titles=("cone resistance", "friction number", "soil behaviour type index"))
+    __add_envelope_traces(fig, qc, 1, 'mediumblue', 'rgba(0, 0, 205, {opacity})', scatter)
+    __add_envelope_traces(fig, rf, 2, 'red', 'rgba(255, 0, 0, {opacity})', scatter, showlegend=False)
+    if show_ic:
+        __add_envelope_traces(fig, ic, 3, 'darkgreen', 'rgba(0, 100, 0, {opacity})', scatter, showlegend=False)
+
+    # Format axes and grids per subplot
+    standard_grid_options = dict(showgrid=True, gridwidth=1, gridcolor='DarkGrey')
+    standard_line_options = dict(showline=True, linewidth=2, linecolor='DarkGrey')
+    bottom = qc.elevation[-1] if len(qc.elevation) else 0.
+
+    fig.update_xaxes(row=1, col=1, **standard_line_options, **standard_grid_options,
+                     range=[0, 30], tick0=0, dtick=1, title_text="Qc [MPa]")
+    fig.update_yaxes(row=1, col=1, **standard_grid_options, title_text="Depth [m] w.r.t. NAP",
+                     tick0=floor(bottom) - 5, dtick=1)
+    fig.update_xaxes(row=1, col=2, **standard_line_options, **standard_grid_options,
+                     range=[10, 0], tick0=0, dtick=1, title_text="Rf [%]")
+    fig.update_yaxes(row=1, col=2, **standard_grid_options,
+                     tick0=floor(bottom) - 5, dtick=1)
+    if show_ic:
+        __format_ic_axes(fig, row=1, col=3)
+
+    fig.update_layout(template='plotly_white', title=f'Envelope of {len(cpts)} CPTs')  # Forces white background
+
+    return fig
+
+
+def __format_ic_axes(fig: go.Figure, row: int, col: int = None):
+    """Format the Ic axes of a row or subplot, with the soil behaviour type zone boundaries as grid lines"""
+    fig.update_xaxes(row=row, col=col, showline=True, linewidth=2, linecolor='DarkGrey', showgrid=True, gridwidth=1,
+                     gridcolor='DarkGrey', range=[1, 4], tickvals=SBT_ZONE_BOUNDARIES, title_text="Ic [-]")
+    fig.update_yaxes(row=row, col=col, showgrid=True, gridwidth=1, gridcolor='DarkGrey')
+
+
+@lru_cache(maxsize=16)
+def __paged_layout_template(columns: int, show_ic: bool) -> dict:
+    """
+    Layout of a page of the multiple graphs plot with `columns` cpts, with the axes formatted as in the single figure
+    but without the elevation range and column titles. Built once per page size and shared, so it must not be modified.
+    """
+    rows = 3 if show_ic else 2
+    fig = make_subplots(rows=rows, cols=columns, shared_yaxes=True, shared_xaxes='rows',
+                        column_titles=[str(col) for col in range(1, columns + 1)])
+
+    # Format axes and grids per subplot
+    standard_grid_options = dict(showgrid=True, gridwidth=1, gridcolor='DarkGrey')
+    standard_line_options = dict(showline=True, linewidth=2, linecolor='DarkGrey')
+    fig.update_xaxes(row=1, **standard_line_options, **standard_grid_options, range=[0, 30], tick0=0, dtick=1,
+                     title_text="Qc [MPa]")
+    fig.update_xaxes(row=2, **standard_line_options, **standard_grid_options, range=[10, 0], tick0=0, dtick=1,
+                     title_text="Rf [%]")
+    if show_ic:
+        __format_ic_axes(fig, row=3)
+    fig.update_yaxes(**standard_grid_options, dtick=1)
+    fig.update_yaxes(col=1, title_text="Depth [m]")
+
+    # Set subplot titles to a lower fontsize, because they are usually long names
+    for subplot_title in fig['layout']['annotations']:
+        subplot_title['font'] = dict(size=10)
+
+    fig.update_layout(template='plotly_white', showlegend=False)  # Forces white background
+    return fig.to_plotly_json()['layout']
+
+
+def __axis_names(row: int, col: int, columns: int) -> Tuple[str, str]:
+    """Names of the x and y axis of a subplot, numbered row by row as in make_subplots"""
+    number = (row - 1) * columns + col
+    suffix = '' if number == 1 else str(number)
+    return f'x{suffix}', f'y{suffix}'
+
+
+@timed('paged_graphs_figure')
+def __visualize_page_of_cpts_in_multiple_graphs(cpts: List[TraceData], elevation_range: Tuple[float, float],
+                                                 page_size: int, page: int, scatter=go.Scatter,
+                                                 show_ic: bool = False) -> go.Figure:
+    """
+    Plot one page of the multiple graphs plot: the cpts of the page as subplots on a horizontal layout. Only the traces
+    of the page are created, the layout is copied from a template that is shared by all pages of the same size. The
+    elevation range is the range of the whole selection, so pages can be compared with each other.
+    """
+    page_count = max(ceil(len(cpts) / page_size), 1)
+    page = min(max(page or 1, 1), page_count)
+    page_cpts = cpts[(page - 1) * page_size:page * page_size]
+    template = __paged_layout_template(page_size, show_ic)
+
+    signals = [('qc', 'mediumblue', 'Qc'), ('rf', 'red', 'Friction number')]
+    if show_ic:
+        signals.append(('ic', 'darkgreen', 'Soil behaviour type index'))
+    data = []
+    for row, (signal, color, name) in enumerate(signals, start=1):
+        for col, cpt in enumerate(page_cpts, start=1):
+            x_axis, y_axis = __axis_names(row, col, page_size)
+            data.append(cpt.trace(scatter, signal, name=f'{name} {cpt.name}', hovertext=f'{cpt.name}', mode='lines',
+                                  line=dict(color=color, width=1.25), xaxis=x_axis, yaxis=y_axis))
+
+    # Copy only the parts of the template that differ per page
+    bottom, top = elevation_range
+    layout = dict(template)
+    for row in range(1, len(signals) + 1):
+        for col in range(1, page_size + 1):
+            x_axis, y_axis = __axis_names(row, col, page_size)
+            x_axis_name, y_axis_name = x_axis.replace('x', 'xaxis'), y_axis.replace('y', 'yaxis')
+            layout[y_axis_name] = dict(template[y_axis_name], range=[floor(bottom) - 5, ceil(top) + 1],
+                                       tick0=ceil(top) + 1)
+            if col > len(page_cpts):  # hide the empty subplots of the last page
+                layout[x_axis_name] = dict(template[x_axis_name], visible=False)
+                layout[y_axis_name]['visible'] = False
+    titles = [cpt.name[:-4] for cpt in page_cpts] + [''] * (page_size - len(page_cpts))
+    layout['annotations'] = [dict(annotation, text=title) for annotation, title in zip(template['annotations'], titles)]
+    layout['title'] = dict(text=f"CPTs {(page - 1) * page_size + 1}-{(page - 1) * page_size + len(page_cpts)} of "
+                                f"{len(cpts)} (page {page} of {page_count})")
+    return go.Figure(data=data, layout=layout)
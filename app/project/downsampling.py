@@ -0,0 +1,55 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Sequence
+
+import numpy as np
+
+
+def min_max_downsample(signals: Sequence[np.ndarray], max_points: int) -> np.ndarray:
+    """
+    Indices of the samples to keep so that the signals are plotted with at most about `max_points` points.
+
+    The samples are split into bins of consecutive measurements (so equal depth intervals for a regularly sampled
+    cpt). For every bin the minimum and maximum of each signal are kept, which preserves peaks and sharp transitions
+    at layer boundaries. The first missing value of a bin is kept as well, so gaps in the signal remain visible. The
+    same indices are used for all signals, so traces of one cpt keep sharing their elevation array.
+    """
+    length = len(signals[0])
+    points_per_bin = 3 * len(signals)
+    if length <= max_points or max_points < points_per_bin:
+        return np.arange(length)
+
+    number_of_bins = max_points // points_per_bin
+    bin_size = -(-length // number_of_bins)
+    padded_length = number_of_bins * bin_size
+    offsets = np.arange(number_of_bins) * bin_size
+
+    keep = [np.array([0, length - 1])]
+    for signal in signals:
+        blocks = np.full(padded_length, np.nan)
+        blocks[:length] = signal
+        blocks = blocks.reshape(number_of_bins, bin_size)
+        missing = np.zeros(padded_length, dtype=bool)
+        missing[:length] = np.isnan(signal)
+        missing = missing.reshape(number_of_bins, bin_size)
+        empty = np.isnan(blocks)  # missing values and the padding of the last bin
+        keep.append(offsets + np.argmin(np.where(empty, np.inf, blocks), axis=1))
+        keep.append(offsets + np.argmax(np.where(empty, -np.inf, blocks), axis=1))
+        keep.append((offsets + np.argmax(missing, axis=1))[missing.any(axis=1)])
+
+    indices = np.unique(np.concatenate(keep))
+    return indices[indices < length]
@@ -0,0 +1,73 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import List
+from typing import NamedTuple
+
+import numpy as np
+
+from .similarity import common_elevation_grid
+from .similarity import resample
+from ..cpt_file.model import CPT
+
+ENVELOPE_INTERVAL = 0.1  # m
+PERCENTILES = (5., 50., 95.)
+
+
+class DepthEnvelope(NamedTuple):
+    """Statistics of a signal over all cpts per point of a descending elevation grid [m]"""
+    elevation: np.ndarray
+    count: np.ndarray
+    p5: np.ndarray
+    p50: np.ndarray
+    p95: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+
+
+def _nan_percentiles(values: np.ndarray, count: np.ndarray, percentiles=PERCENTILES) -> np.ndarray:
+    """
+    Linearly interpolated percentiles per column of `values`, ignoring NaN, as a (len(percentiles), columns) array.
+    Equivalent to np.nanpercentile(values, percentiles, axis=0), but with one sort instead of a Python loop over the
+    columns. Columns without any value are NaN.
+    """
+    ordered = np.sort(values, axis=0)  # NaN is sorted to the end of each column
+    positions = np.multiply.outer(np.asarray(percentiles) / 100., np.maximum(count - 1, 0))
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    fraction = positions - lower
+    lower_values = np.take_along_axis(ordered, lower, axis=0)
+    upper_values = np.take_along_axis(ordered, upper, axis=0)
+    result = lower_values + fraction * (upper_values - lower_values)
+    result[:, count == 0] = np.nan
+    return result
+
+
+def depth_envelope(cpts: List[CPT], signal: str, interval: float = ENVELOPE_INTERVAL) -> DepthEnvelope:
+    """
+    P5/P50/P95, mean and standard deviation of a signal ('qc' or 'rf') of all cpts, resampled on a shared elevation
+    grid. The size of the result only depends on the elevation range of the cpts, not on their number.
+    """
+    grid = common_elevation_grid(cpts, interval)
+    values = resample(cpts, grid, signal)
+    valid = np.isfinite(values)
+    count = valid.sum(axis=0)
+    filled = np.where(valid, values, 0.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = filled.sum(axis=0) / count
+        std = np.sqrt(np.where(valid, (values - mean) ** 2, 0.).sum(axis=0) / count)
+    p5, p50, p95 = _nan_percentiles(values, count)
+    return DepthEnvelope(grid, count, p5, p50, p95, mean, std)
@@ -0,0 +1,89 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from munch import Munch
+
+from viktor.core import progress_message
+from ..cpt_file.cache import CPTCache
+from ..cpt_file.cache import load_cpt
+from ..cpt_file.model import CPT
+from ..instrumentation import stage
+
+FETCH_WORKERS = int(os.environ.get('CPT_FETCH_WORKERS', 8))
+
+
+def _entity_label(entity) -> str:
+    """Name of an entity for error reports, without failing when the name can not be retrieved either"""
+    try:
+        return entity.name
+    except Exception:  # pylint: disable=broad-except
+        return f'CPT File {entity.id}'
+
+
+def _fetch_params(entity) -> Tuple[Optional[Munch], Optional[str]]:
+    """Params of the last saved revision of an entity, returning the error instead of raising it"""
+    try:
+        return entity.last_saved_params, None
+    except Exception as error:  # pylint: disable=broad-except
+        return None, f'{_entity_label(entity)}: {error}'
+
+
+def fetch_cpts(entities: list, max_workers: int = None, cache: CPTCache = None) -> Tuple[List[CPT], List[str]]:
+    """
+    Retrieve the params of CPT File entities and create the cpts. The params are fetched concurrently in a thread
+    pool of at most `max_workers` (default FETCH_WORKERS) requests, `max_workers=1` fetches them serially. Each cpt is
+    created as soon as its params arrive, while the remaining requests are still pending. Returns the cpts in the
+    order of `entities` and an error per entity that could not be fetched or read, so a single failing CPT does not
+    abort the others.
+    """
+    cpts: List[Optional[CPT]] = [None] * len(entities)
+    errors: Dict[int, str] = {}
+
+    def build(index, cpt_params, error, done):
+        if error is None:
+            with stage('build_cpt'):
+                try:
+                    cpts[index] = load_cpt(cpt_params, cache)
+                except Exception as build_error:  # pylint: disable=broad-except
+                    error = f'{_entity_label(entities[index])}: {build_error}'
+        if error is not None:
+            errors[index] = error
+        progress_message(f"Retrieved {done} of {len(entities)} CPTs", percentage=done / len(entities) * 100)
+
+    max_workers = max_workers or FETCH_WORKERS
+    if max_workers == 1 or len(entities) <= 1:
+        for done, (index, entity) in enumerate(enumerate(entities), start=1):
+            with stage('fetch_params'):
+                result = _fetch_params(entity)
+            build(index, *result, done)
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(entities))) as pool:
+            futures = {pool.submit(_fetch_params, entity): index for index, entity in enumerate(entities)}
+            completed = as_completed(futures)
+            for done in range(1, len(entities) + 1):
+                with stage('fetch_params'):  # time spent waiting for the next response
+                    future = next(completed)
+                build(futures[future], *future.result(), done)
+
+    return [cpt for cpt in cpts if cpt is not None], [errors[index] for index in sorted(errors)]
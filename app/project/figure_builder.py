@@ -0,0 +1,186 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import heapq
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from .downsampling import min_max_downsample
+from ..cpt_file.model import CPT
+
+MAX_BUILDERS = 32
+MEMORY_BUDGET = int(os.environ.get('FIGURE_BUILDER_MEMORY_BUDGET', 64 * 1024 ** 2))  # bytes, all builders together
+MAX_TRACES_PER_CPT = 6  # cached trace objects per cpt, e.g. the Qc, Rf and Ic trace in two layouts
+
+
+class TraceData:
+    """
+    Downsampled plot data of one cpt, shared by the Qc, Rf and Ic trace, and the trace objects created from it. Ic is
+    only read with `show_ic`, or later with `add_ic`, because it may have to be recomputed for older CPT Files.
+    `nbytes` is an upper bound of the memory of the data and the cached traces.
+    """
+    __slots__ = ('name', 'elevation', 'qc', 'rf', 'ic', 'extent', 'nbytes', '_indices', '_traces')
+
+    def __init__(self, cpt: CPT, max_points: Optional[int], show_ic: bool = False):
+        self.name = cpt.name
+        self.extent = cpt.extent
+        self.ic: Optional[np.ndarray] = None
+        if max_points is None:
+            self._indices = None
+            self.elevation, self.qc, self.rf = cpt.elevation, cpt.qc, cpt.rf
+        else:
+            self._indices = min_max_downsample([cpt.qc, cpt.rf], max_points)
+            self.elevation, self.qc, self.rf = (cpt.elevation[self._indices], cpt.qc[self._indices],
+                                                cpt.rf[self._indices])
+        if show_ic:
+            self.add_ic(cpt)
+        # Four arrays including Ic, and every cached trace holds a copy of two of them
+        self.nbytes = 4 * self.elevation.nbytes * (2 + MAX_TRACES_PER_CPT) // 2
+        self._traces: 'OrderedDict[Hashable, object]' = OrderedDict()
+
+    def add_ic(self, cpt: CPT) -> None:
+        """Read the Ic of the cpt, at the same samples as the other signals"""
+        self.ic = cpt.ic if self._indices is None else cpt.ic[self._indices]
+
+    def trace(self, scatter, signal: str, **properties):
+        """
+        Trace of a signal ('qc', 'rf' or 'ic') against elevation, created once per trace type and set of properties.
+        The trace is copied when it is added to a figure, so the cached object is never modified.
+        """
+        key = (scatter, signal, tuple(sorted((name, repr(value)) for name, value in properties.items())))
+        if key in self._traces:
+            self._traces.move_to_end(key)
+            return self._traces[key]
+        trace = scatter(x=getattr(self, signal), y=self.elevation, **properties)
+        self._traces[key] = trace
+        if len(self._traces) > MAX_TRACES_PER_CPT:
+            self._traces.popitem(last=False)
+        return trace
+
+
+class IncrementalFigureBuilder:
+    """
+    Trace data and elevation extents of the current cpt selection, kept between requests. On a selection change only
+    the added cpts are downsampled, and the elevation range is maintained with two heaps with lazy deletion, so both
+    cost O(log n) per added or removed cpt instead of a pass over the whole selection. An unchanged selection returns
+    the previous result. Cpts without a content hash are prepared on every update and not kept.
+    """
+
+    def __init__(self, max_points: Optional[int]):
+        self.max_points = max_points
+        self.nbytes = 0
+        self._traces: Dict[Hashable, TraceData] = {}
+        self._selection: List[Hashable] = []
+        self._result: Optional[Tuple[List[TraceData], Tuple[float, float]]] = None
+        self._result_has_ic = False
+        self._bottoms: List[Tuple[float, int, Hashable]] = []
+        self._tops: List[Tuple[float, int, Hashable]] = []
+        self._counter = itertools.count()  # tie breaker, so heap entries never compare their keys
+        self._lock = threading.Lock()
+
+    def update(self, cpts: List[CPT], show_ic: bool = False) -> Tuple[List[TraceData], Tuple[float, float]]:
+        """
+        Update the selection and return its trace data, in selection order, and elevation range [m]. The Ic of the cpts
+        is only read with `show_ic`.
+        """
+        with self._lock:
+            selection = [cpt.key for cpt in cpts]
+            if self._result is not None and selection == self._selection and (self._result_has_ic or not show_ic):
+                return self._result
+
+            selected = set(selection)
+            for key in self._traces.keys() - selected:
+                self.nbytes -= self._traces.pop(key).nbytes  # the heap entries are dropped lazily
+            for key, cpt in zip(selection, cpts):
+                if key is None:
+                    continue
+                if key not in self._traces:
+                    self._add(key, cpt, show_ic)
+                elif show_ic and self._traces[key].ic is None:
+                    self._traces[key].add_ic(cpt)
+            self._selection = selection
+
+            unkeyed = [TraceData(cpt, self.max_points, show_ic) for cpt in cpts if cpt.key is None]
+            unkeyed_traces = iter(unkeyed)
+            traces = [self._traces[key] if key is not None else next(unkeyed_traces) for key in selection]
+            result = traces, self._elevation_range(unkeyed)
+            self._result = None if unkeyed else result
+            self._result_has_ic = show_ic
+            return result
+
+    def _add(self, key: Hashable, cpt: CPT, show_ic: bool) -> None:
+        trace_data = TraceData(cpt, self.max_points, show_ic)
+        self._traces[key] = trace_data
+        self.nbytes += trace_data.nbytes
+        bottom, top = trace_data.extent
+        if np.isfinite(bottom):
+            count = next(self._counter)
+            heapq.heappush(self._bottoms, (bottom, count, key))
+            heapq.heappush(self._tops, (-top, count, key))
+        if len(self._bottoms) > 2 * len(self._traces) + 16:
+            self._compact_heaps()
+
+    def _elevation_range(self, unkeyed: List[TraceData]) -> Tuple[float, float]:
+        for heap in (self._bottoms, self._tops):
+            while heap and heap[0][2] not in self._traces:
+                heapq.heappop(heap)
+        extents = [trace_data.extent for trace_data in unkeyed if np.isfinite(trace_data.extent[0])]
+        if self._bottoms:
+            extents.append((self._bottoms[0][0], -self._tops[0][0]))
+        if not extents:
+            return 0., 0.
+        return min(bottom for bottom, _ in extents), max(top for _, top in extents)
+
+    def _compact_heaps(self) -> None:
+        """Drop the entries of removed cpts, which otherwise accumulate when the selection changes often"""
+        self._bottoms = [entry for entry in self._bottoms if entry[2] in self._traces]
+        self._tops = [entry for entry in self._tops if entry[2] in self._traces]
+        heapq.heapify(self._bottoms)
+        heapq.heapify(self._tops)
+
+
+_builders: 'OrderedDict[Hashable, IncrementalFigureBuilder]' = OrderedDict()
+_builders_lock = threading.Lock()
+
+
+def get_figure_builder(entity_id: Hashable, max_points: Optional[int]) -> IncrementalFigureBuilder:
+    """
+    Builder of the comparison figure of an entity, shared by the requests handled by this worker. Least recently used
+    builders are dropped when the builders together exceed the memory budget. Full resolution trace data is not kept
+    between requests, the columns of the cpts are already kept by the cpt cache.
+    """
+    if max_points is None:
+        return IncrementalFigureBuilder(max_points)
+    with _builders_lock:
+        key = (entity_id, max_points)
+        if key in _builders:
+            _builders.move_to_end(key)
+        else:
+            _builders[key] = IncrementalFigureBuilder(max_points)
+        total = sum(builder.nbytes for builder in _builders.values())
+        while len(_builders) > 1 and (len(_builders) > MAX_BUILDERS or total > MEMORY_BUDGET):
+            _, evicted = _builders.popitem(last=False)
+            total -= evicted.nbytes
+        return _builders[key]
@@ -0,0 +1,106 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import base64
+import hashlib
+import json
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+from plotly import graph_objects as go
+from plotly.offline import get_plotlyjs_version
+from plotly.utils import PlotlyJSONEncoder
+
+PLOTLY_CDN_URL = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+_WEBGL_TEMPLATE = """<html>
+<head>
+<meta charset="utf-8"/>
+<script src="{plotly_url}"></script>
+</head>
+<body style="margin:0">
+<div id="figure" style="height:100vh;width:100%;"></div>
+<script>
+const columns = {columns}.map(function (encoded) {{
+    const bytes = Uint8Array.from(atob(encoded), function (c) {{ return c.charCodeAt(0); }});
+    return new Float32Array(bytes.buffer);
+}});
+const figure = {figure};
+const traceColumns = {trace_columns};
+figure.data.forEach(function (trace, i) {{
+    if (traceColumns[i][0] !== null) {{ trace.x = columns[traceColumns[i][0]]; }}
+    if (traceColumns[i][1] !== null) {{ trace.y = columns[traceColumns[i][1]]; }}
+}});
+Plotly.newPlot('figure', figure.data, figure.layout, {{responsive: true}});
+</script>
+</body>
+</html>
+"""
+
+
+def figure_to_html(figure: go.Figure, webgl: bool = False) -> str:
+    """
+    Render a figure to a html page. The default renders a self-contained page with plotly.js inlined.
+
+    With `webgl=True`, plotly.js is loaded from the (browser cached) CDN and the x and y data of the traces are
+    embedded once as base64 encoded float32 arrays, which are decoded to typed arrays in the browser. Identical arrays,
+    such as the elevation of the Qc and Rf trace of one cpt, are only embedded once and shared between the traces.
+    Trace data that is missing or not numeric stays in the figure JSON.
+    """
+    if not webgl:
+        return figure.to_html()
+
+    figure_dict = figure.to_plotly_json()
+    columns: List[str] = []
+    column_index: Dict[bytes, int] = {}
+    trace_columns = []
+    for trace in figure_dict['data']:
+        indices = []
+        for key in ('x', 'y'):
+            values = _numeric_values(trace.get(key))
+            if values is None:  # no data or not numeric (e.g. categories), left as JSON in the figure
+                indices.append(None)
+                continue
+            del trace[key]
+            block = values.astype('<f4').tobytes()
+            digest = hashlib.blake2b(block, digest_size=16).digest()
+            if digest not in column_index:
+                column_index[digest] = len(columns)
+                columns.append(base64.b64encode(block).decode('ascii'))
+            indices.append(column_index[digest])
+        trace_columns.append(indices)
+
+    return _WEBGL_TEMPLATE.format(
+        plotly_url=PLOTLY_CDN_URL,
+        columns=json.dumps(columns),
+        figure=json.dumps(figure_dict, cls=PlotlyJSONEncoder),
+        trace_columns=json.dumps(trace_columns),
+    )
+
+
+def _numeric_values(values) -> Optional[np.ndarray]:
+    """Values of a trace as a float array, None if there are no values or they are not numeric"""
+    if values is None:
+        return None
+    array = np.asarray(values)
+    if array.ndim != 1 or array.dtype.kind not in 'biufO':
+        return None
+    try:
+        return array.astype(np.float64)  # gaps (None) in object arrays become NaN
+    except (TypeError, ValueError):
+        return None
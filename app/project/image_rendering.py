@@ -0,0 +1,232 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from plotly import graph_objects as go
+
+try:
+    import kaleido
+except ImportError:  # static image export is optional, the interactive views do not need kaleido
+    kaleido = None
+
+from .cpt_comparison_helper_functions import visualize_multiple_cpts_in_graph
+from ..cpt_file.derived import DERIVED_VERSION
+from ..cpt_file.model import CPT
+
+RENDER_VERSION = 1
+IMAGE_FORMATS = ('png', 'svg')
+IMAGE_WIDTH = 1600  # px
+IMAGE_HEIGHT = 900  # px
+RENDER_CACHE_DIRECTORY = Path(os.environ.get('CPT_RENDER_CACHE_DIRECTORY',
+                                             Path(tempfile.gettempdir()) / 'cpt-render-cache'))
+RENDER_CACHE_MEMORY_BUDGET = int(os.environ.get('CPT_RENDER_CACHE_MEMORY_BUDGET', 64 * 1024 ** 2))  # bytes
+RENDER_CACHE_DISK_BUDGET = int(os.environ.get('CPT_RENDER_CACHE_DISK_BUDGET', 512 * 1024 ** 2))  # bytes
+
+
+def render_key(cpt_keys: List[str], options: dict, image_format: str) -> str:
+    """Key of a rendered comparison: the content hashes of the cpts in plot order, the plot options and the format"""
+    content = json.dumps([RENDER_VERSION, DERIVED_VERSION, cpt_keys, options, image_format, IMAGE_WIDTH, IMAGE_HEIGHT],
+                         sort_keys=True)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def figure_to_image(figure: go.Figure, image_format: str) -> bytes:
+    """Render a figure to a PNG or SVG image with kaleido, without a browser"""
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format {image_format}, use one of {IMAGE_FORMATS}")
+    if kaleido is None:
+        raise ValueError("Static image export requires the 'kaleido' package")
+    return figure.to_image(format=image_format, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, engine='kaleido')
+
+
+def render_comparison(cpts: List[CPT], options: dict, image_format: str) -> bytes:
+    """Render the comparison figure of cpts with the given options to an image"""
+    return figure_to_image(visualize_multiple_cpts_in_graph(cpts, **options), image_format)
+
+
+def _render_comparison_safely(cpts: List[CPT], options: dict,
+                              image_format: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """Render a comparison in a worker process, returning the error instead of raising it"""
+    try:
+        return render_comparison(cpts, options, image_format), None
+    except Exception as error:  # pylint: disable=broad-except
+        return None, str(error)
+
+
+class RenderCache:
+    """
+    Cache of rendered comparison images. Images are kept in memory up to `memory_budget` bytes and written through to
+    `directory`, which is limited to `disk_budget` bytes, so repeated exports are also served after a restart.
+    """
+
+    def __init__(self, memory_budget: int = RENDER_CACHE_MEMORY_BUDGET, disk_budget: int = RENDER_CACHE_DISK_BUDGET,
+                 directory: Path = RENDER_CACHE_DIRECTORY):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.RLock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached image for `key`, or None when it is neither in memory nor on disk"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            try:
+                image = self._path(key).read_bytes()
+            except OSError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_in_memory(key, image)
+            return image
+
+    def put(self, key: str, image: bytes) -> None:
+        """Store the image for `key` in memory and on disk"""
+        with self._lock:
+            self._put_in_memory(key, image)
+            if self.disk_budget <= 0:
+                return
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                temporary_path = self.directory / f'{key}.{threading.get_ident()}.tmp'
+                temporary_path.write_bytes(image)
+                os.replace(temporary_path, self._path(key))
+                self._enforce_disk_budget()
+            except OSError:
+                pass  # the disk store is best effort, a failed write only costs a future render
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'memory_entries': len(self._memory),
+                    'memory_bytes': self._memory_size}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.image'
+
+    def _put_in_memory(self, key: str, image: bytes) -> None:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = image
+        self._memory_size += len(image)
+        while self._memory_size > self.memory_budget and len(self._memory) > 1:
+            _, evicted_image = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted_image)
+
+    def _enforce_disk_budget(self) -> None:
+        """Remove the least recently written images until the directory fits in the disk budget"""
+        paths = sorted(self.directory.glob('*.image'), key=lambda path: path.stat().st_mtime)
+        sizes = [path.stat().st_size for path in paths]
+        total = sum(sizes)
+        for path, size in zip(paths, sizes):
+            if total <= self.disk_budget:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+_shared_render_cache: Optional[RenderCache] = None
+_shared_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Render cache shared by all requests handled by this worker"""
+    global _shared_render_cache  # pylint: disable=global-statement
+    with _shared_render_cache_lock:
+        if _shared_render_cache is None:
+            _shared_render_cache = RenderCache()
+        return _shared_render_cache
+
+
+def cached_render(cpts: List[CPT], options: dict, image_format: str, cache: RenderCache = None) -> bytes:
+    """Rendered comparison of cpts, from the render cache when the same cpts were rendered with the same options"""
+    cache = cache or get_render_cache()
+    key = render_key([cpt.key for cpt in cpts], options, image_format)
+    image = cache.get(key)
+    if image is None:
+        image = render_comparison(cpts, options, image_format)
+        cache.put(key, image)
+    return image
+
+
+def render_comparisons(jobs: Dict[str, Tuple[List[CPT], dict]], image_format: str,
+                       max_workers: int = None, cache: RenderCache = None) -> Tuple[Dict[str, bytes], Dict[str, str]]:
+    """
+    Render a batch of comparisons, given per name as the cpts and the plot options. Images in the render cache
+    are reused, the others are rendered concurrently in a process pool (each process runs its own renderer),
+    `max_workers=1` renders them serially in the current process. Returns the images per name and the rendering errors
+    per name, so a single failing comparison does not abort the batch.
+    """
+    cache = cache or get_render_cache()
+    images: Dict[str, bytes] = {}
+    errors: Dict[str, str] = {}
+    pending = {}
+    for name, (cpts, options) in jobs.items():
+        key = render_key([cpt.key for cpt in cpts], options, image_format)
+        image = cache.get(key)
+        if image is None:
+            pending[name] = (key, cpts, options)
+        else:
+            images[name] = image
+
+    def report(name, image, error):
+        if error is None:
+            cache.put(pending[name][0], image)
+            images[name] = image
+        else:
+            errors[name] = error
+
+    if max_workers == 1 or len(pending) <= 1:
+        for name, (_, cpts, options) in pending.items():
+            report(name, *_render_comparison_safely(cpts, options, image_format))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {}
+            for name, (_, cpts, options) in pending.items():
+                try:
+                    futures[pool.submit(_render_comparison_safely, cpts, options, image_format)] = name
+                except Exception as error:  # pylint: disable=broad-except
+                    report(name, None, str(error))
+            for future in as_completed(futures):
+                # Errors outside the rendering, such as data that can not be sent to the worker, are raised here
+                try:
+                    result = future.result()
+                except Exception as error:  # pylint: disable=broad-except
+                    result = None, str(error)
+                report(futures[future], *result)
+
+    # Keep the order of the jobs, independent of the order in which the workers finished
+    return {name: images[name] for name in jobs if name in images}, errors
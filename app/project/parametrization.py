@@ -17,14 +17,51 @@ SOFTWARE.
 """
 
 from viktor.parametrization import ChildEntityMultiSelectField
+from viktor.parametrization import DownloadButton
+from viktor.parametrization import FileField
+from viktor.parametrization import GeoPointField
+from viktor.parametrization import GeoPolygonField
+from viktor.parametrization import IntegerField
+from viktor.parametrization import IsEqual
+from viktor.parametrization import IsFalse
+from viktor.parametrization import IsTrue
 from viktor.parametrization import LineBreak
+from viktor.parametrization import Lookup
+from viktor.parametrization import OptionField
 from viktor.parametrization import Parametrization
 from viktor.parametrization import ToggleButton
+from .image_rendering import IMAGE_FORMATS
+from .similarity import METRICS
+from ..cpt_file.controller import CPT_ENTITY_TYPES
 
 
 class ProjectParametrization(Parametrization):
     """Defines the input fields in left-side of the web UI in the Sample entity (Editor)."""
+    selection_mode = OptionField('Select CPTs by', options=['List', 'Nearest to point', 'Within polygon'], default='List', flex=60)
+    lb0 = LineBreak()
     selected_cpts = ChildEntityMultiSelectField('Select CPTs that you want to compare',
-                                                entity_type_names=['CPTFile'], flex=60)
+                                                entity_type_names=CPT_ENTITY_TYPES, flex=60,
+                                                visible=IsEqual(Lookup('selection_mode'), 'List'))
+    map_point = GeoPointField('Point', visible=IsEqual(Lookup('selection_mode'), 'Nearest to point'))
+    nearest_count = IntegerField('Number of nearest CPTs', default=5, min=1, visible=IsEqual(Lookup('selection_mode'), 'Nearest to point'))
+    map_polygon = GeoPolygonField('Polygon', visible=IsEqual(Lookup('selection_mode'), 'Within polygon'))
     lb1 = LineBreak()
-    single_graph = ToggleButton('Single graph', default=False)
+    single_graph = ToggleButton('Single graph', default=False, visible=IsFalse(Lookup('envelope')))
+    envelope = ToggleButton('Envelope', default=False)
+    webgl = ToggleButton('WebGL rendering', default=False)
+    show_ic = ToggleButton('Soil behaviour type index', default=False)
+    lb2 = LineBreak()
+    paged = ToggleButton('Paged', default=False, visible=IsFalse(Lookup('single_graph')))
+    page_size = IntegerField('CPTs per page', default=10, min=1, visible=IsTrue(Lookup('paged')))
+    page = IntegerField('Page', default=1, min=1, visible=IsTrue(Lookup('paged')))
+    lb3 = LineBreak()
+    full_resolution = ToggleButton('Full resolution', default=False)
+    max_points_per_trace = IntegerField('Max points per trace', default=2000, min=100, visible=IsFalse(Lookup('full_resolution')))
+    lb4 = LineBreak()
+    similarity_metric = OptionField('Similarity metric', options=list(METRICS), default='Qc correlation', flex=60)
+    lb5 = LineBreak()
+    image_format = OptionField('Image format', options=list(IMAGE_FORMATS), default='png', flex=60)
+    download_comparison_image = DownloadButton('Download image', method='download_comparison_image', longpoll=True)
+    lb6 = LineBreak()
+    gef_archive = FileField('Zip archive with GEF files', file_types=['.zip'], flex=60)
+    import_gef_archive = DownloadButton('Import GEF files', method='import_gef_archive', longpoll=True)
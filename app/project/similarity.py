@@ -0,0 +1,149 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+from ..cpt_file.model import CPT
+
+GRID_INTERVAL = 0.05  # m
+DTW_POINTS = 100
+DTW_WINDOW = 10
+DTW_BATCH_SIZE = 4096
+MINIMUM_COMMON_POINTS = 3
+
+
+def common_elevation_grid(cpts: List[CPT], interval: float = GRID_INTERVAL) -> np.ndarray:
+    """Descending elevation grid [m] spanning all cpts"""
+    extents = np.array([cpt.extent for cpt in cpts], dtype=np.float64).reshape(-1, 2)
+    if not np.isfinite(extents).any():
+        return np.empty(0)
+    bottom, top = np.nanmin(extents[:, 0]), np.nanmax(extents[:, 1])
+    return top - np.arange(int(np.floor((top - bottom) / interval)) + 1) * interval
+
+
+def resample(cpts: List[CPT], grid: np.ndarray, signal: str) -> np.ndarray:
+    """
+    Values of a signal ('qc' or 'rf') of all cpts on the elevation grid, as an (N, len(grid)) array. Missing values
+    are interpolated, the grid points outside the measured range of a cpt are NaN.
+    """
+    values = np.full((len(cpts), len(grid)), np.nan)
+    ascending_grid = grid[::-1]
+    for i, cpt in enumerate(cpts):
+        column = getattr(cpt, signal)
+        valid = np.isfinite(cpt.elevation) & np.isfinite(column)
+        if not valid.any():
+            continue
+        order = np.argsort(cpt.elevation[valid], kind='stable')
+        values[i] = np.interp(ascending_grid, cpt.elevation[valid][order], column[valid][order],
+                              left=np.nan, right=np.nan)[::-1]
+    return values
+
+
+def _pairwise_sums(values: np.ndarray):
+    """Sums over the grid points where both cpts of a pair have a value, for all pairs at once"""
+    mask = np.isfinite(values).astype(np.float64)
+    filled = np.where(mask > 0, values, 0.)
+    count = mask @ mask.T
+    sum_i = filled @ mask.T  # sum of the values of cpt i over the points shared with cpt j
+    sum_squares_i = (filled ** 2) @ mask.T
+    sum_products = filled @ filled.T
+    return count, sum_i, sum_squares_i, sum_products
+
+
+def correlation_matrix(values: np.ndarray) -> np.ndarray:
+    """Pearson correlation between all pairs of resampled signals over their common elevation range"""
+    count, sum_i, sum_squares_i, sum_products = _pairwise_sums(values)
+    sum_j, sum_squares_j = sum_i.T, sum_squares_i.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = count * sum_products - sum_i * sum_j
+        variance = (count * sum_squares_i - sum_i ** 2) * (count * sum_squares_j - sum_j ** 2)
+        correlation = covariance / np.sqrt(variance)
+    correlation[count < MINIMUM_COMMON_POINTS] = np.nan
+    return np.clip(correlation, -1., 1.)
+
+
+def rmse_matrix(values: np.ndarray) -> np.ndarray:
+    """Root mean square difference between all pairs of resampled signals over their common elevation range"""
+    count, _, sum_squares_i, sum_products = _pairwise_sums(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_square = (sum_squares_i + sum_squares_i.T - 2 * sum_products) / count
+    mean_square[count < MINIMUM_COMMON_POINTS] = np.nan
+    return np.sqrt(np.maximum(mean_square, 0.))
+
+
+def dtw_matrix(values: np.ndarray, points: int = DTW_POINTS, window: int = DTW_WINDOW,
+               batch_size: int = DTW_BATCH_SIZE) -> np.ndarray:
+    """
+    Dynamic time warping distance between all pairs of signals, which allows layers to be shifted in depth between
+    cpts. The signals are reduced to `points` points over their own measured range, and the warping is limited to a
+    band of `window` points (Sakoe-Chiba). The dynamic programming recursion is evaluated for a batch of pairs at once.
+    """
+    number_of_cpts = len(values)
+    profiles = np.full((number_of_cpts, points), np.nan)
+    for i, row in enumerate(values):
+        valid = np.flatnonzero(np.isfinite(row))
+        if len(valid):
+            profiles[i] = np.interp(np.linspace(valid[0], valid[-1], points), valid, row[valid])
+
+    # Pairs with a cpt without data keep a NaN distance, like the pairs without common points of the other metrics
+    has_profile = np.isfinite(profiles[:, 0])
+    distances = np.full((number_of_cpts, number_of_cpts), np.nan)
+    distances[has_profile, has_profile] = 0.
+    first, second = np.triu_indices(number_of_cpts, k=1)
+    both = has_profile[first] & has_profile[second]
+    first, second = first[both], second[both]
+    for start in range(0, len(first), batch_size):
+        # Arrays are laid out as (point, pair), so every step of the recursion works on contiguous rows
+        a = np.ascontiguousarray(profiles[first[start:start + batch_size]].T)
+        b = np.ascontiguousarray(profiles[second[start:start + batch_size]].T)
+        previous = np.full((points + 1, a.shape[1]), np.inf)
+        previous[0] = 0.
+        for i in range(1, points + 1):
+            low, high = max(1, i - window), min(points, i + window)
+            # Everything that does not depend on the current row is evaluated for the whole band at once
+            cost = np.abs(a[i - 1] - b[low - 1:high])
+            vertical_or_diagonal = np.minimum(previous[low:high + 1], previous[low - 1:high])
+            current = np.full_like(previous, np.inf)
+            for j in range(low, high + 1):
+                current[j] = cost[j - low] + np.minimum(vertical_or_diagonal[j - low], current[j - 1])
+            previous = current
+        distances[first[start:start + batch_size], second[start:start + batch_size]] = previous[points] / points
+
+    upper = np.triu_indices(number_of_cpts, k=1)
+    distances.T[upper] = distances[upper]
+    return distances
+
+
+METRICS: Dict[str, Tuple[str, Callable[[np.ndarray], np.ndarray]]] = {
+    'Qc correlation': ('qc', correlation_matrix),
+    'Rf correlation': ('rf', correlation_matrix),
+    'Qc RMSE [MPa]': ('qc', rmse_matrix),
+    'Rf RMSE [%]': ('rf', rmse_matrix),
+    'Qc DTW distance [MPa]': ('qc', dtw_matrix),
+}
+
+
+def similarity_matrix(cpts: List[CPT], metric: str) -> np.ndarray:
+    """N x N matrix of the similarity metric between all pairs of cpts"""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown similarity metric {metric}, use one of {list(METRICS)}")
+    signal, pairwise_function = METRICS[metric]
+    return pairwise_function(resample(cpts, common_elevation_grid(cpts), signal))
@@ -0,0 +1,206 @@
+"""Copyright (c) 2022 VIKTOR B.V.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit
+persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+VIKTOR B.V. PROVIDES THIS SOFTWARE ON AN "AS IS" BASIS, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import heapq
+import threading
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from ..cpt_file.controller import CPT_ENTITY_TYPES
+from ..cpt_file.model import CPT
+
+DEFAULT_NEAREST_COUNT = 5
+
+
+class KDTree:
+    """Static two-dimensional kd-tree for nearest neighbour and region queries on point coordinates"""
+    LEAF_SIZE = 16
+
+    def __init__(self, points: np.ndarray):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self._order = np.arange(len(self.points))
+        # Per node: the [start, end) slice of self._order it covers, its children (-1 for a leaf) and bounding box
+        self._slices: List[Tuple[int, int]] = []
+        self._children: List[Tuple[int, int]] = []
+        self._boxes: List[Tuple[np.ndarray, np.ndarray]] = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self._slices)
+        segment = self.points[self._order[start:end]]
+        self._slices.append((start, end))
+        self._children.append((-1, -1))
+        self._boxes.append((segment.min(axis=0), segment.max(axis=0)))
+        if end - start > self.LEAF_SIZE:
+            axis = int(np.argmax(self._boxes[node][1] - self._boxes[node][0]))
+            middle = (end - start) // 2
+            partition = np.argpartition(segment[:, axis], middle)
+            self._order[start:end] = self._order[start:end][partition]
+            left = self._build(start, start + middle)
+            right = self._build(start + middle, end)
+            self._children[node] = (left, right)
+        return node
+
+    def _distance_to_box(self, node: int, point: np.ndarray) -> float:
+        box_min, box_max = self._boxes[node]
+        return float(np.hypot(*np.maximum(np.maximum(box_min - point, point - box_max), 0.)))
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> np.ndarray:
+        """Indices of the k points nearest to `point`, nearest first"""
+        if not self._slices or k <= 0:
+            return np.empty(0, dtype=int)
+        point = np.asarray(point, dtype=np.float64)
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, index) of the k nearest points found so far
+        candidates = [(self._distance_to_box(0, point), 0)]
+        while candidates:
+            box_distance, node = heapq.heappop(candidates)
+            if len(best) == k and box_distance > -best[0][0]:
+                break
+            left, right = self._children[node]
+            if left >= 0:
+                for child in (left, right):
+                    heapq.heappush(candidates, (self._distance_to_box(child, point), child))
+                continue
+            start, end = self._slices[node]
+            indices = self._order[start:end]
+            distances = np.hypot(*(self.points[indices] - point).T)
+            for distance, index in zip(distances, indices):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, int(index)))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, int(index)))
+        return np.array([index for _, index in sorted(best, reverse=True)], dtype=int)
+
+    def within_box(self, box_min: Sequence[float], box_max: Sequence[float]) -> np.ndarray:
+        """Indices of the points inside the axis-aligned box"""
+        box_min, box_max = np.asarray(box_min, dtype=np.float64), np.asarray(box_max, dtype=np.float64)
+        found = []
+        stack = [0] if self._slices else []
+        while stack:
+            node = stack.pop()
+            node_min, node_max = self._boxes[node]
+            if (node_max < box_min).any() or (node_min > box_max).any():
+                continue
+            left, right = self._children[node]
+            if left >= 0 and not ((node_min >= box_min).all() and (node_max <= box_max).all()):
+                stack.extend((left, right))
+                continue
+            start, end = self._slices[node]
+            indices = self._order[start:end]
+            inside = ((self.points[indices] >= box_min) & (self.points[indices] <= box_max)).all(axis=1)
+            found.append(indices[inside])
+        return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=int)
+
+    def within_polygon(self, polygon: Sequence[Sequence[float]]) -> np.ndarray:
+        """Indices of the points inside the polygon, given as a sequence of (x, y) vertices"""
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(polygon) < 3:
+            return np.empty(0, dtype=int)
+        candidates = self.within_box(polygon.min(axis=0), polygon.max(axis=0))
+        return candidates[_points_in_polygon(self.points[candidates], polygon)]
+
+
+def _points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd rule (ray casting) for all points at once"""
+    x, y = points[:, 0, None], points[:, 1, None]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crosses = ((y1 > y) != (y2 > y)) & (x < crossing_x)
+    return (np.count_nonzero(crosses, axis=1) % 2) == 1
+
+
+class CPTLocation:
+    """Header information of a CPT File that is needed to select it on a map"""
+    __slots__ = ('entity_id', 'name', 'x', 'y', 'ground_level', 'bottom')
+
+    def __init__(self, entity_id: int, cpt_params):
+        headers = cpt_params['headers']
+        coordinates = headers.get('x_y_coordinates') or (np.nan, np.nan)
+        ground_level = headers.get('ground_level_wrt_reference')
+        self.entity_id = entity_id
+        self.name = headers['name']
+        self.x, self.y = float(coordinates[0]), float(coordinates[1])
+        self.ground_level = ground_level * 1e-3 if ground_level is not None else np.nan  # m
+        if 'final_depth_wrt_reference' in headers:
+            final_depth = headers['final_depth_wrt_reference']
+            self.bottom = final_depth * 1e-3 if final_depth is not None else np.nan  # m
+        else:  # CPT Files uploaded before the final depth was stored in the headers
+            self.bottom = CPT(cpt_params).extent[0]
+
+
+class CPTLocationIndex:
+    """
+    Spatial index of the CPT Files of a project. The header information of a CPT File is read once, when the index is
+    refreshed after its upload. The params of the added CPT Files are fetched in one request and only their headers
+    are used, so the measurement data is not decoded.
+    """
+
+    def __init__(self):
+        self.locations: Dict[int, CPTLocation] = {}
+        self._tree: Optional[KDTree] = None
+        self._tree_ids = np.empty(0, dtype=int)
+        self._lock = threading.Lock()
+
+    def refresh(self, project) -> None:
+        """Add CPT Files uploaded to the project (an api_v1 Entity) since the last refresh and drop deleted ones"""
+        with self._lock:
+            children = {child.id: child for child in
+                        project.children(include_params=False, entity_type_names=CPT_ENTITY_TYPES)}
+            removed = set(self.locations).difference(children)
+            added = set(children).difference(self.locations)
+            for entity_id in removed:
+                del self.locations[entity_id]
+            for entity_id in added:
+                self.locations[entity_id] = CPTLocation(entity_id, children[entity_id].last_saved_params)
+            if removed or added or self._tree is None:
+                self._rebuild_tree()
+
+    def _rebuild_tree(self) -> None:
+        located = [location for location in self.locations.values()
+                   if np.isfinite(location.x) and np.isfinite(location.y)]
+        self._tree_ids = np.array([location.entity_id for location in located], dtype=int)
+        self._tree = KDTree(np.array([(location.x, location.y) for location in located]))
+
+    def nearest(self, x: float, y: float, k: int) -> List[CPTLocation]:
+        """The k CPTs nearest to the point, nearest first"""
+        with self._lock:
+            return [self.locations[entity_id] for entity_id in self._tree_ids[self._tree.nearest((x, y), k)]]
+
+    def within_polygon(self, polygon: Sequence[Tuple[float, float]]) -> List[CPTLocation]:
+        """The CPTs inside the polygon, given as a sequence of (x, y) vertices"""
+        with self._lock:
+            return [self.locations[entity_id] for entity_id in self._tree_ids[self._tree.within_polygon(polygon)]]
+
+
+_indices: Dict[Hashable, CPTLocationIndex] = {}
+_indices_lock = threading.Lock()
+
+
+def get_location_index(project_id: Hashable) -> CPTLocationIndex:
+    """Location index of a project, shared by the requests handled by this worker"""
+    with _indices_lock:
+        if project_id not in _indices:
+            _indices[project_id] = CPTLocationIndex()
+        return _indices[project_id]
@@ -14,7 +14,19 @@ SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from io import BytesIO
+
+from munch import Munch
+
+from viktor import UserError
+from viktor.api_v1 import API
 from viktor.core import ViktorController
+from viktor.core import progress_message
+from viktor.result import DownloadResult
+from .parametrization import ProjectFolderParametrization
+from ..project.controller import ProjectController
+from ..project.cpt_comparison_helper_functions import comparison_options
+from ..project.image_rendering import render_comparisons
 
 
 class ProjectFolderController(ViktorController):
@@ -22,3 +34,29 @@ class ProjectFolderController(ViktorController):
     label = "Projects"
     children = ['Project']
     show_children_as = 'Table'
+    parametrization = ProjectFolderParametrization
+
+    @staticmethod
+    def download_comparison_sheets(params: Munch, entity_id: int, **kwargs) -> DownloadResult:
+        """Render the comparison of every project in the folder to an image and return them in a zip archive"""
+        projects = API().get_entity(entity_id).children(entity_type_names=['Project'])
+        jobs, errors = {}, {}
+        for i, project in enumerate(projects):
+            name = f'{project.name} ({project.id})'
+            progress_message(f"Gathering CPTs of {project.name}", percentage=(i / len(projects) * 100))
+            project_params = project.last_saved_params
+            try:
+                jobs[name] = (ProjectController.get_all_cpts(project_params, project.id),
+                              comparison_options(project_params))
+            except UserError as error:
+                errors[name] = str(error)
+
+        progress_message(f"Rendering {len(jobs)} comparison sheets")
+        images, render_errors = render_comparisons(jobs, params.image_format)
+        errors.update(render_errors)
+
+        report = [f"Rendered {len(images)} of {len(projects)} projects"]
+        report += [f"Failed {name}: {error}" for name, error in errors.items()]
+        zipped_files = {f'{name}.{params.image_format}': BytesIO(image) for name, image in images.items()}
+        zipped_files['report.txt'] = BytesIO(('\n'.join(report) + '\n').encode())
+        return DownloadResult(zipped_files=zipped_files, file_name='comparison_sheets.zip')
@@ -0,0 +1,62 @@
+"""
+Duration of the bulk import of a zip archive of synthetic GEF files, parsed serially and in a process pool with
+increasing numbers of workers. GEFFile.parse is a call to the VIKTOR platform, so besides the offline parser alone the
+import is also measured with PARSE_LATENCY added to every parse, like a platform round trip. The speedup of the offline
+parser alone is limited by the number of CPUs.
+
+Run from the repository root: python -m benchmarks.bench_bulk_import
+"""
+import os
+import time
+import zipfile
+from io import BytesIO
+from unittest import mock
+
+from app.cpt_file.bulk_import import parse_gef_archive
+from .offline import OfflineGEFFile
+from .offline import offline_viktor
+from .synthetic import synthetic_gef
+
+FILE_COUNTS = (10, 50)
+WORKERS = (1, 2, 4, 8)
+ROWS = 10000
+PARSE_LATENCY = 0.05  # s
+
+
+class LatencyGEFFile(OfflineGEFFile):
+    """Offline GEF parser that waits PARSE_LATENCY before parsing, as the platform parser does for its round trip"""
+
+    def parse(self, *args, **kwargs):
+        time.sleep(PARSE_LATENCY)
+        return super().parse(*args, **kwargs)
+
+
+def synthetic_archive(count: int) -> bytes:
+    """Zip archive with `count` synthetic GEF files"""
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for seed in range(count):
+            zip_file.writestr(f'CPT-{seed:04d}.gef', synthetic_gef(ROWS, seed=seed))
+    return archive.getvalue()
+
+
+def main():
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'parser':<8} {'files':>6} {'workers':>8} {'duration [s]':>13} {'speedup':>8}")
+    with offline_viktor():  # the worker processes are forked and inherit the offline stand-ins
+        for parser, gef_file in (('offline', OfflineGEFFile), ('latency', LatencyGEFFile)):
+            with mock.patch('app.cpt_file.parsing.GEFFile', gef_file):
+                for count in FILE_COUNTS:
+                    archive = synthetic_archive(count)
+                    serial_duration = None
+                    for workers in WORKERS:
+                        start = time.perf_counter()
+                        parsed_files, errors = parse_gef_archive(BytesIO(archive), max_workers=workers)
+                        duration = time.perf_counter() - start
+                        assert len(parsed_files) == count and not errors
+                        serial_duration = serial_duration or duration
+                        print(f"{parser:<8} {count:>6} {workers:>8} {duration:>13.2f} "
+                              f"{serial_duration / duration:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
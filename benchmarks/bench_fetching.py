@@ -0,0 +1,43 @@
+"""
+Duration of retrieving the selected cpts from a stand-in for the entity API with an injected latency per request,
+serially and with increasing numbers of concurrent requests.
+
+Run from the repository root: python -m benchmarks.bench_fetching
+"""
+import tempfile
+import time
+
+from app.cpt_file.cache import CPTCache
+from app.project.fetching import fetch_cpts
+from .offline import LatencyEntity
+from .offline import offline_viktor
+from .synthetic import synthetic_cpt_params
+
+CPT_COUNTS = (10, 50)
+WORKERS = (1, 4, 8, 16)
+ROWS = 2000
+
+
+def main():
+    print(f"{'cpts':>5} {'workers':>8} {'duration [s]':>13} {'speedup':>8}")
+    with offline_viktor(), tempfile.TemporaryDirectory() as directory:
+        for count in CPT_COUNTS:
+            entities = [LatencyEntity(seed, synthetic_cpt_params(ROWS, seed=seed)) for seed in range(count)]
+            serial_duration = None
+            for workers in WORKERS:
+                # A cold cache per run, so every run also creates the cpts
+                cache = CPTCache(disk_budget=0, directory=directory)
+                start = time.perf_counter()
+                cpts, errors = fetch_cpts(entities, max_workers=workers, cache=cache)
+                duration = time.perf_counter() - start
+                assert len(cpts) == count and not errors
+                serial_duration = serial_duration or duration
+                print(f"{count:>5} {workers:>8} {duration:>13.2f} {serial_duration / duration:>7.1f}x")
+
+        entities[1].fail = True
+        cpts, errors = fetch_cpts(entities, cache=CPTCache(disk_budget=0, directory=directory))
+        print(f"With one failing entity: {len(cpts)} cpts, errors {errors}")
+
+
+if __name__ == '__main__':
+    main()
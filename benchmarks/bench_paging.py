@@ -0,0 +1,47 @@
+"""
+Build time of the multiple graphs comparison as a single figure and as pages of a fixed number of cpts, for
+increasing numbers of cpts. The first page of a page size also builds the shared layout template.
+
+Run from the repository root: python -m benchmarks.bench_paging
+"""
+import time
+from math import ceil
+
+from app.cpt_file.model import CPT
+from app.project.cpt_comparison_helper_functions import visualize_multiple_cpts_in_graph
+from app.project.figure_builder import IncrementalFigureBuilder
+from .offline import offline_viktor
+from .synthetic import synthetic_cpt_params
+
+CPT_COUNTS = (10, 30, 60)
+PAGE_SIZE = 10
+ROWS = 2000
+MAX_POINTS = 2000
+
+
+def duration(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'cpts':>5} {'single figure [s]':>18} {'first page [s]':>15} {'page [s]':>9} {'all pages [s]':>14}")
+    with offline_viktor():
+        for count in CPT_COUNTS:
+            cpts = [CPT(synthetic_cpt_params(ROWS, seed=seed), key=f'cpt-{seed}') for seed in range(count)]
+            builder = IncrementalFigureBuilder(MAX_POINTS)
+            builder.update(cpts)  # the trace data is shared by both layouts, only the figure build is compared
+
+            def page(number):
+                return visualize_multiple_cpts_in_graph(cpts, builder=builder, page_size=PAGE_SIZE, page=number)
+
+            single_figure = duration(lambda: visualize_multiple_cpts_in_graph(cpts, builder=builder))
+            first_page = duration(lambda: page(1))
+            warm_page = duration(lambda: page(1))
+            all_pages = duration(lambda: [page(number) for number in range(1, ceil(count / PAGE_SIZE) + 1)])
+            print(f"{count:>5} {single_figure:>18.2f} {first_page:>15.2f} {warm_page:>9.2f} {all_pages:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Html payload size and render time of the SVG and WebGL rendering modes of the comparison figure.
+
+Run from the repository root: python -m benchmarks.bench_rendering
+"""
+import time
+
+from app.cpt_file.model import CPT
+from app.project.cpt_comparison_helper_functions import visualize_multiple_cpts_in_graph
+from app.project.html_rendering import figure_to_html
+from .synthetic import synthetic_cpt_params
+
+CPT_COUNTS = (10, 50)
+ROWS = 20000
+MAX_POINTS = (2000, None)
+
+
+def main():
+    print(f"{'cpts':>5} {'max points':>10} {'graph':<9} {'mode':<6} {'html [MB]':>10} {'render [s]':>11}")
+    for count in CPT_COUNTS:
+        cpts = [CPT(synthetic_cpt_params(ROWS, seed=seed)) for seed in range(count)]
+        for max_points in MAX_POINTS:
+            for single_graph in (False, True):
+                for webgl in (False, True):
+                    start = time.perf_counter()
+                    figure = visualize_multiple_cpts_in_graph(cpts, single_graph, max_points, webgl)
+                    html = figure_to_html(figure, webgl)
+                    duration = time.perf_counter() - start
+                    print(f"{count:>5} {str(max_points):>10} {'single' if single_graph else 'multiple':<9} "
+                          f"{'webgl' if webgl else 'svg':<6} {len(html) / 1e6:>10.2f} {duration:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
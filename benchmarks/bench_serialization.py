@@ -0,0 +1,42 @@
+"""
+Size and latency of the plain list and binary column formats of the CPT measurement data.
+
+Run from the repository root: python -m benchmarks.bench_serialization
+"""
+import json
+import time
+
+from app.cpt_file.model import CPT
+from app.cpt_file.serialization import encode_measurement_data
+from app.cpt_file.serialization import zstandard
+from .synthetic import synthetic_cpt_params
+
+ROWS = (1000, 10000, 50000)
+FORMATS = [('<f4', 'none'), ('<f4', 'zlib'), ('<f8', 'zlib')] + ([('<f4', 'zstd')] if zstandard else [])
+
+
+def _load(payload: str) -> float:
+    """Seconds to load the params JSON and prepare the plotting columns"""
+    start = time.perf_counter()
+    cpt = CPT(json.loads(payload))
+    _ = cpt.elevation, cpt.qc, cpt.rf
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'rows':>6} {'format':<12} {'size [kB]':>10} {'ratio':>6} {'encode [ms]':>12} {'load [ms]':>10}")
+    for rows in ROWS:
+        params = synthetic_cpt_params(rows)
+        plain = json.dumps(params)
+        print(f"{rows:>6} {'list':<12} {len(plain) / 1e3:>10.1f} {1:>6.1f} {'':>12} {_load(plain) * 1e3:>10.1f}")
+        for dtype, compression in FORMATS:
+            start = time.perf_counter()
+            measurement_data = encode_measurement_data(params['measurement_data'], dtype, compression)
+            encode_time = time.perf_counter() - start
+            encoded = json.dumps({**params, 'measurement_data': measurement_data})
+            print(f"{rows:>6} {dtype + ' ' + compression:<12} {len(encoded) / 1e3:>10.1f} "
+                  f"{len(plain) / len(encoded):>6.1f} {encode_time * 1e3:>12.1f} {_load(encoded) * 1e3:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
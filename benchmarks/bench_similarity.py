@@ -0,0 +1,28 @@
+"""
+Duration of the project-wide similarity metrics for increasing numbers of cpts.
+
+Run from the repository root: python -m benchmarks.bench_similarity
+"""
+import time
+
+from app.cpt_file.model import CPT
+from app.project.similarity import METRICS
+from app.project.similarity import similarity_matrix
+from .synthetic import synthetic_cpt_params
+
+CPT_COUNTS = (10, 100, 500)
+ROWS = 2000
+
+
+def main():
+    print(f"{'cpts':>5} {'metric':<24} {'duration [s]':>13}")
+    for count in CPT_COUNTS:
+        cpts = [CPT(synthetic_cpt_params(ROWS, seed=seed)) for seed in range(count)]
+        for metric in METRICS:
+            start = time.perf_counter()
+            similarity_matrix(cpts, metric)
+            print(f"{count:>5} {metric:<24} {time.perf_counter() - start:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Stand-ins for the VIKTOR SDK calls that need the platform, so the benchmarks run offline."""
+import time
+from contextlib import ExitStack
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from munch import Munch
+
+from viktor.geo import GEFData
+from viktor.geo import GEFParsingException
+
+PROGRESS_MESSAGE_TARGETS = (
+    'app.cpt_file.bulk_import.progress_message',
+    'app.project.controller.progress_message',
+    'app.project.cpt_comparison_helper_functions.progress_message',
+    'app.project.fetching.progress_message',
+)
+LATENCY = 0.05  # s per request
+
+
+class OfflineGEFFile:
+    """
+    Stand-in for viktor.geo.GEFFile, which parses on the VIKTOR platform. It supports the files written by
+    benchmarks.synthetic.synthetic_gef and returns the same structure as GEFFile.parse. Like GEFFile it derives Rf from
+    the local friction when the file has no friction ratio column, and raises a GEFParsingException when a required
+    column or the ground level is missing.
+    """
+
+    def __init__(self, file_content: str):
+        self.file_content = file_content
+
+    def parse(self, additional_columns=None, verbose=True, return_gef_data_obj=True):
+        header, _, data = self.file_content.partition('#EOH=')
+        quantities, voids, headers = {}, {}, {}
+        for line in header.splitlines():
+            keyword, _, value = line.partition('=')
+            fields = [field.strip() for field in value.split(',')]
+            if keyword == '#COLUMNINFO':
+                quantities[int(fields[3])] = int(fields[0]) - 1
+            elif keyword == '#COLUMNVOID':
+                voids[int(fields[0]) - 1] = float(fields[1])
+            elif keyword == '#ZID':
+                headers['ground_level_wrt_reference'] = float(fields[1]) * 1e3
+            elif keyword == '#XYID':
+                headers['x_y_coordinates'] = [float(fields[1]), float(fields[2])]
+            elif keyword == '#TESTID':
+                headers['name'] = fields[0]
+        headers['height_system'] = 'NAP'
+
+        table = np.genfromtxt(StringIO(data), delimiter=';', usecols=range(len(voids)), ndmin=2)
+        for column, void in voids.items():
+            table[table[:, column] == void, column] = np.nan
+        if 1 not in quantities or 2 not in quantities:
+            raise GEFParsingException("The GEF file needs a penetration length and qc column")
+        if 'ground_level_wrt_reference' not in headers:
+            raise GEFParsingException("The GEF file has no ground level (#ZID)")
+        qc = table[:, quantities[2]]
+        if 4 in quantities:
+            rf = table[:, quantities[4]] / 100
+        elif 3 in quantities:  # the friction ratio is derived from the local friction, as GEFFile does
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rf = np.where(qc > 0, table[:, quantities[3]] / qc, np.nan)
+        else:
+            raise GEFParsingException("The GEF file needs a friction ratio or local friction column")
+        columns = {
+            'elevation': headers['ground_level_wrt_reference'] - np.abs(table[:, quantities[1]]) * 1e3,
+            'qc': qc,
+            'Rf': rf,
+        }
+        measurement_data = {name: np.where(np.isnan(column), None, column).tolist() for name, column in columns.items()}
+        gef_data = GEFData({'headers': headers, 'measurement_data': measurement_data})
+        return gef_data if return_gef_data_obj else gef_data.serialize()
+
+
+@contextmanager
+def offline_viktor():
+    """Replace the GEF parsing and progress messages of the app with offline stand-ins"""
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch('app.cpt_file.parsing.GEFFile', OfflineGEFFile))
+        for target in PROGRESS_MESSAGE_TARGETS:
+            stack.enter_context(mock.patch(target, lambda *args, **kwargs: None))
+        yield
+
+
+class LatencyEntity:
+    """Stand-in for a viktor.api_v1.Entity of which every params request takes `latency` seconds"""
+
+    def __init__(self, entity_id: int, params: dict, latency: float = LATENCY, fail: bool = False):
+        self.id = entity_id
+        self.name = f'CPT-{entity_id:04d}'
+        self._params = params
+        self.latency = latency
+        self.fail = fail
+
+    @property
+    def last_saved_params(self) -> Munch:
+        time.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError('injected failure')
+        return Munch.fromDict(self._params)
@@ -0,0 +1,137 @@
+"""
+Benchmark suite of the comparison pipeline: parsing a GEF file, loading a CPT, building the comparison figure and
+rendering it to html. Wall time, peak memory (tracemalloc) and html size are stored as JSON. When a baseline
+result file is given, the run fails if a measurement exceeds the baseline by more than the threshold.
+
+Runs offline, the VIKTOR platform calls are replaced by the stand-ins of benchmarks.offline.
+
+Run from the repository root:
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --threshold 0.25
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Tuple
+
+from app.cpt_file.model import CPT
+from app.cpt_file.parsing import parse_gef
+from app.project.cpt_comparison_helper_functions import visualize_multiple_cpts_in_graph
+from app.project.html_rendering import figure_to_html
+from .offline import offline_viktor
+from .synthetic import synthetic_gef
+
+ROWS = (1000, 10000, 50000)
+CPT_COUNTS = (1, 10, 50)
+FIGURE_ROWS = 10000
+QUICK_ROWS = (1000, 10000)
+QUICK_CPT_COUNTS = (1, 10)
+PAGE_SIZE = 10
+
+# A case is a setup function, which is not measured, and a run function that receives the result of the setup
+Case = Tuple[Callable[[], object], Callable[[object], object]]
+
+
+def cases(rows: Tuple[int, ...], cpt_counts: Tuple[int, ...]) -> Iterator[Tuple[str, Case]]:
+    for row_count in rows:
+        yield f'parse_gef[rows={row_count}]', (lambda n=row_count: synthetic_gef(n), parse_gef)
+        yield f'load_cpt[rows={row_count}]', (
+            lambda n=row_count: parse_gef(synthetic_gef(n)),
+            lambda params: CPT(params).columns,
+        )
+
+    for count in cpt_counts:
+        def setup(n=count):
+            cpts = [CPT(parse_gef(synthetic_gef(FIGURE_ROWS, seed=seed))) for seed in range(n)]
+            for cpt in cpts:
+                _ = cpt.columns
+            return cpts
+
+        for single_graph in (False, True):
+            layout = 'single' if single_graph else 'multiple'
+            yield f'visualize[cpts={count},{layout}]', (
+                setup,
+                lambda cpts, single=single_graph: visualize_multiple_cpts_in_graph(cpts, single_graph=single),
+            )
+            yield f'to_html[cpts={count},{layout}]', (
+                lambda n=count, single=single_graph: visualize_multiple_cpts_in_graph(setup(n), single_graph=single),
+                figure_to_html,
+            )
+
+        yield f'visualize[cpts={count},paged]', (
+            setup,
+            lambda cpts: visualize_multiple_cpts_in_graph(cpts, page_size=PAGE_SIZE),
+        )
+
+
+def measure(case: Case, repeat: int) -> Dict[str, float]:
+    """Best wall time over `repeat` runs, peak memory of one traced run and the size of a returned string"""
+    setup, run = case
+    state = setup()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run(state)
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(state)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    measurement = {'time': min(durations), 'peak_memory': peak_memory}
+    if isinstance(result, str):
+        measurement['output_size'] = len(result)
+    return measurement
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> Iterator[str]:
+    for name, measurement in results.items():
+        for metric, value in measurement.items():
+            reference = baseline.get(name, {}).get(metric)
+            if reference and value > reference * (1 + threshold):
+                yield f"{name} {metric}: {value:.4g} vs baseline {reference:.4g} (+{value / reference - 1:.0%})"
+
+
+def main(arguments=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', help="JSON file to write the results to")
+    parser.add_argument('--baseline', help="JSON file with earlier results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative increase over the baseline")
+    parser.add_argument('--repeat', type=int, default=3, help="number of timed runs per case")
+    parser.add_argument('--quick', action='store_true', help="only run the smaller cases")
+    parser.add_argument('--filter', default='', help="only run the cases whose name contains this text")
+    arguments = parser.parse_args(arguments)
+
+    rows, cpt_counts = (QUICK_ROWS, QUICK_CPT_COUNTS) if arguments.quick else (ROWS, CPT_COUNTS)
+    results = {}
+    with offline_viktor():
+        for name, case in cases(rows, cpt_counts):
+            if arguments.filter not in name:
+                continue
+            results[name] = measure(case, arguments.repeat)
+            print(f"{name:<36} {results[name]['time']:>9.4f} s {results[name]['peak_memory'] / 1e6:>9.1f} MB"
+                  + (f" {results[name]['output_size'] / 1e6:>9.2f} MB html" if 'output_size' in results[name] else ''))
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump({'python': platform.python_version(), 'results': results}, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)['results']
+        failures = list(regressions(results, baseline, arguments.threshold))
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
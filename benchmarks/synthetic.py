@@ -0,0 +1,104 @@
+"""Synthetic CPT data for the benchmarks."""
+from typing import Optional
+
+import numpy as np
+
+
+def synthetic_measurement_data(rows: int, seed: int = 0, ground_level: float = 1500.,
+                               interval: float = 20., missing_fraction: float = 0.001) -> dict:
+    """
+    Measurement data in the format of GEFData.serialize(): elevation [mm], qc [MPa] and Rf [-] as lists, None for
+    missing values. The qc signal is a sequence of layers with noise and occasional peaks.
+    """
+    random = np.random.default_rng(seed)
+    elevation = ground_level - np.arange(rows) * interval
+    layer_boundaries = np.sort(random.choice(rows, size=max(1, rows // 2000), replace=False))
+    layer_qc = random.uniform(0.5, 25., size=len(layer_boundaries) + 1)
+    qc = layer_qc[np.searchsorted(layer_boundaries, np.arange(rows))] * random.lognormal(0., 0.15, rows)
+    peaks = random.random(rows) < 0.002
+    qc[peaks] *= random.uniform(1.5, 3., peaks.sum())
+    rf = np.clip(0.08 / np.sqrt(qc) * random.lognormal(0., 0.2, rows), 0.001, 0.12)
+
+    measurement_data = {
+        'elevation': np.round(elevation, 1).tolist(),
+        'qc': np.round(qc, 3).tolist(),
+        'Rf': np.round(rf, 4).tolist(),
+    }
+    for name in ('qc', 'Rf'):
+        for index in np.flatnonzero(random.random(rows) < missing_fraction):
+            measurement_data[name][index] = None
+    return measurement_data
+
+
+def synthetic_cpt_params(rows: int, seed: int = 0, name: Optional[str] = None, **kwargs) -> dict:
+    """Params of a CPTFile entity with synthetic measurement data"""
+    random = np.random.default_rng(seed)
+    ground_level = float(np.round(random.uniform(-2000., 3000.), 0))
+    return {
+        'headers': {
+            'name': name or f'CPT-{seed:04d}.gef',
+            'ground_level_wrt_reference': ground_level,
+            'x_y_coordinates': [float(np.round(random.uniform(100000., 110000.), 2)),
+                                float(np.round(random.uniform(450000., 460000.), 2))],
+            'height_system': 'NAP',
+        },
+        'measurement_data': synthetic_measurement_data(rows, seed=seed, ground_level=ground_level, **kwargs),
+    }
+
+
+GEF_COLUMNS = {
+    # name: (unit, description, GEF quantity number)
+    'penetration_length': ('m', 'penetration length', 1),
+    'qc': ('MPa', 'cone resistance', 2),
+    'fs': ('MPa', 'local friction', 3),
+    'Rf': ('%', 'friction ratio', 4),
+    'u2': ('MPa', 'pore pressure u2', 6),
+    'inclination': ('deg', 'inclination', 8),
+}
+COLUMN_VOID = -9999.
+
+
+def synthetic_gef(rows: int, seed: int = 0, columns=('penetration_length', 'qc', 'fs', 'Rf'),
+                  missing_fraction: float = 0.001, interval: float = 0.02) -> str:
+    """
+    Content of a GEF file with a synthetic cpt of `rows` measurements. Missing values are written with the
+    #COLUMNVOID sentinel, the first column is always the penetration length.
+    """
+    columns = ('penetration_length',) + tuple(column for column in columns if column != 'penetration_length')
+    random = np.random.default_rng(seed)
+    measurement_data = synthetic_measurement_data(rows, seed=seed, interval=interval * 1e3,
+                                                  missing_fraction=missing_fraction)
+    qc = np.array(measurement_data['qc'], dtype=np.float64)
+    rf = np.array(measurement_data['Rf'], dtype=np.float64) * 100
+    values = {
+        'penetration_length': np.arange(rows) * interval,
+        'qc': qc,
+        'fs': qc * rf / 100,
+        'Rf': rf,
+        'u2': np.arange(rows) * interval * 0.01 + random.normal(0., 0.005, rows),
+        'inclination': np.abs(random.normal(0.5, 0.2, rows)),
+    }
+    table = np.column_stack([np.nan_to_num(values[column], nan=COLUMN_VOID) for column in columns])
+
+    ground_level = np.round(random.uniform(-2., 3.), 2)
+    header = [
+        '#GEFID= 1, 1, 0',
+        '#FILEOWNER= Synthetic',
+        '#FILEDATE= 2022, 1, 1',
+        f'#PROJECTID= CPT, {seed}',
+        f'#COLUMN= {len(columns)}',
+        '#COLUMNSEPARATOR= ;',
+    ]
+    header += [f'#COLUMNINFO= {i}, {GEF_COLUMNS[column][0]}, {GEF_COLUMNS[column][1]}, {GEF_COLUMNS[column][2]}'
+               for i, column in enumerate(columns, start=1)]
+    header += [f'#COLUMNVOID= {i}, {COLUMN_VOID}' for i in range(1, len(columns) + 1)]
+    header += [
+        f'#XYID= 31000, {random.uniform(100000., 110000.):.2f}, {random.uniform(450000., 460000.):.2f}',
+        f'#ZID= 31000, {ground_level:.2f}',
+        f'#TESTID= CPT-{seed:04d}',
+        '#MEASUREMENTTEXT= 9, NAP, reference level',
+        f'#LASTSCAN= {rows}',
+        '#EOH=',
+    ]
+    lines = [';'.join(f'{value:.4f}' for value in row) + ';' for row in table]
+    return '\n'.join(header + lines) + '\n'
@@ -0,0 +1,63 @@
+"""
+Record the output of viktor.geo.GEFFile for the GEF files in tests/fixtures/gef, which the streaming reader is
+compared against in tests/test_gef_reader.py. GEFFile parses on the VIKTOR platform, so run this where it is available
+after changing a fixture case or upgrading the SDK:
+
+    python -m tests.record_gef_fixtures           # record the existing fixture files
+    python -m tests.record_gef_fixtures --write   # also (re)write the GEF files of the fixture cases
+"""
+import argparse
+import json
+from pathlib import Path
+
+from viktor.geo import GEFFile
+from viktor.geo import GEFParsingException
+
+from app.cpt_file.parsing import ADDITIONAL_COLUMNS
+from benchmarks.synthetic import synthetic_gef
+
+FIXTURE_DIRECTORY = Path(__file__).parent / 'fixtures' / 'gef'
+
+
+def without_header(content: str, keyword: str) -> str:
+    return ''.join(line for line in content.splitlines(keepends=True) if not line.startswith(keyword))
+
+
+FIXTURE_CASES = {
+    'headers_and_columns': lambda: synthetic_gef(1000, seed=1),
+    **{f'layers_{seed}': lambda seed=seed: synthetic_gef(1500, seed=seed) for seed in range(3)},
+    'missing_values': lambda: synthetic_gef(1000, seed=2, missing_fraction=0.05),
+    'friction_ratio_from_local_friction': lambda: synthetic_gef(1000, seed=3, columns=('qc', 'fs')),
+    'missing_qc_column': lambda: synthetic_gef(100, columns=('fs', 'Rf')),
+    'missing_friction_columns': lambda: synthetic_gef(100, columns=('qc',)),
+    'missing_ground_level': lambda: without_header(synthetic_gef(100), '#ZID'),
+    'missing_last_scan': lambda: without_header(synthetic_gef(1000), '#LASTSCAN'),
+}
+
+
+def record(content: str) -> dict:
+    """The serialized GEFData of a GEF file, or the message of the GEFParsingException it raises"""
+    try:
+        gef_data = GEFFile(content).parse(additional_columns=ADDITIONAL_COLUMNS, return_gef_data_obj=True)
+    except GEFParsingException as parsing_exception:
+        return {'exception': str(parsing_exception)}
+    return {'gef_data': gef_data.serialize()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--write', action='store_true', help='write the GEF files of the fixture cases first')
+    args = parser.parse_args()
+
+    FIXTURE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    for name, content in FIXTURE_CASES.items():
+        gef_path = FIXTURE_DIRECTORY / f'{name}.gef'
+        if args.write:
+            gef_path.write_text(content(), encoding='ISO-8859-1')
+        recording = record(gef_path.read_text(encoding='ISO-8859-1'))
+        (FIXTURE_DIRECTORY / f'{name}.json').write_text(json.dumps(recording, sort_keys=True) + '\n')
+        print(f'{name}: {"exception" if "exception" in recording else "parsed"}')
+
+
+if __name__ == '__main__':
+    main()
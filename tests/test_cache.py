@@ -0,0 +1,113 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from app.cpt_file.cache import CPTCache
+from app.cpt_file.cache import cpt_key
+from app.cpt_file.cache import load_cpt
+from benchmarks.synthetic import synthetic_cpt_params
+
+ENTRY_SIZE = 2 * 1000 * 8  # bytes, two float64 columns of 1000 values
+
+
+def columns(seed: int) -> dict:
+    random = np.random.default_rng(seed)
+    return {'qc': random.random(1000), 'rf': random.random(1000)}
+
+
+class TestCPTCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def cache(self, **kwargs) -> CPTCache:
+        kwargs.setdefault('memory_budget', 2 * ENTRY_SIZE)
+        return CPTCache(directory=self.directory, **kwargs)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = self.cache(disk_budget=0)
+        cache.put('a', columns(0))
+        cache.put('b', columns(1))
+        cache.get('a')
+        cache.put('c', columns(2))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats['memory_entries'], 2)
+        self.assertEqual(cache.stats['memory_bytes'], 2 * ENTRY_SIZE)
+        self.assertEqual(cache.stats['disk_entries'], 0)
+
+    def test_evicted_entries_are_spilled_to_disk(self):
+        cache = self.cache()
+        for key, seed in (('a', 0), ('b', 1), ('c', 2)):
+            cache.put(key, columns(seed))
+        self.assertEqual(cache.stats['disk_entries'], 1)
+        self.assertTrue((cache.directory / 'a.npz').is_file())
+
+        spilled = cache.get('a')
+        np.testing.assert_array_equal(spilled['qc'], columns(0)['qc'])
+        np.testing.assert_array_equal(spilled['rf'], columns(0)['rf'])
+        self.assertFalse(spilled['qc'].flags.writeable)
+        self.assertEqual(cache.disk_hits, 1)
+
+    def test_disk_budget(self):
+        cache = self.cache(memory_budget=ENTRY_SIZE, disk_budget=int(1.5 * ENTRY_SIZE))
+        for key, seed in (('a', 0), ('b', 1), ('c', 2)):
+            cache.put(key, columns(seed))
+        self.assertEqual(cache.stats['disk_entries'], 1)
+        self.assertFalse((cache.directory / 'a.npz').exists())
+        self.assertIsNotNone(cache.get('b'))
+
+    def test_reload_from_disk(self):
+        first = self.cache()
+        for key, seed in (('a', 0), ('b', 1), ('c', 2)):
+            first.put(key, columns(seed))
+
+        second = self.cache()
+        self.assertEqual(second.stats['disk_entries'], 1)
+        np.testing.assert_array_equal(second.get('a')['qc'], columns(0)['qc'])
+        self.assertEqual((second.hits, second.disk_hits, second.misses), (0, 1, 0))
+
+    def test_corrupt_file_is_a_miss(self):
+        first = self.cache()
+        for key, seed in (('a', 0), ('b', 1), ('c', 2)):
+            first.put(key, columns(seed))
+        (first.directory / 'a.npz').write_bytes(b'not an npz file')
+
+        second = self.cache()
+        self.assertIsNone(second.get('a'))
+        self.assertEqual(second.stats['disk_entries'], 0)
+        self.assertEqual(second.misses, 1)
+
+    def test_counters(self):
+        cache = self.cache()
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', columns(0))
+        cache.get('a')
+        cache.get('a')
+        self.assertEqual((cache.hits, cache.disk_hits, cache.misses), (2, 0, 1))
+
+    def test_load_cpt(self):
+        cache = self.cache(memory_budget=10 * 1024 ** 2)
+        cpt_params = synthetic_cpt_params(500, seed=1)
+        first = load_cpt(cpt_params, cache)
+        second = load_cpt(cpt_params, cache)
+        self.assertEqual(first.key, cpt_key(cpt_params))
+        self.assertIs(first.columns['qc'], second.columns['qc'])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_clear(self):
+        cache = self.cache()
+        for key, seed in (('a', 0), ('b', 1), ('c', 2)):
+            cache.put(key, columns(seed))
+        cache.clear()
+        self.assertEqual(list(cache.directory.glob('*.npz')), [])
+        self.assertEqual(cache.stats['memory_bytes'], 0)
+        self.assertEqual(cache.stats['disk_bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.cpt_file.cache import CPTCache
+from app.cpt_file.cache import load_cpt
+from app.cpt_file.derived import compute_derived_data
+from app.cpt_file.derived import segment_layers
+from app.cpt_file.model import CPT
+from benchmarks.synthetic import synthetic_cpt_params
+
+
+class TestSegmentLayers(unittest.TestCase):
+
+    def setUp(self):
+        cpt = CPT(synthetic_cpt_params(3000, seed=3))
+        self.elevation, self.ic = cpt.elevation * 1e3, cpt.ic
+
+    def test_rounding_of_elevation(self):
+        layers = segment_layers(self.elevation + 1e-9, self.ic, 200.)
+        expected = segment_layers(self.elevation, self.ic, 200.)
+        self.assertEqual(layers['zone'], expected['zone'])
+        np.testing.assert_allclose(layers['top'], expected['top'])
+
+    def test_rounding_of_ic(self):
+        noise = np.random.default_rng(0).normal(0., 1e-6, len(self.ic))
+        self.assertEqual(segment_layers(self.elevation, self.ic + noise, 200.),
+                         segment_layers(self.elevation, self.ic, 200.))
+
+    def test_zone_changes_within_band_do_not_split(self):
+        elevation = -np.arange(100.) * 20.
+        ic = np.full(100, 2.59)
+        ic[40:60] = 2.61  # just above the boundary between zone 5 and 4
+        layers = segment_layers(elevation, ic, 200.)
+        self.assertEqual(layers['zone'], [5])
+        ic[:] = 2.5
+        ic[40:60] = 2.7
+        layers = segment_layers(elevation, ic, 200.)
+        self.assertEqual(layers['zone'], [5, 4, 5])
+
+
+class TestRecomputedDerivedData(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = CPTCache(disk_budget=0, directory=directory.name)
+        self.cpt_params = synthetic_cpt_params(500, seed=1)
+        self.cpt_params['derived_data'] = dict(compute_derived_data(self.cpt_params['measurement_data'],
+                                                                    self.cpt_params['headers']), version=0)
+
+    def test_recomputed_once_per_cache(self):
+        with mock.patch('app.cpt_file.model.compute_derived_data', wraps=compute_derived_data) as compute:
+            first = load_cpt(self.cpt_params, self.cache)
+            second = load_cpt(self.cpt_params, self.cache)
+            np.testing.assert_array_equal(first.ic, second.ic)
+        self.assertEqual(compute.call_count, 1)
+
+    def test_current_derived_data_is_not_recomputed(self):
+        self.cpt_params['derived_data'] = compute_derived_data(self.cpt_params['measurement_data'],
+                                                               self.cpt_params['headers'])
+        with mock.patch('app.cpt_file.model.compute_derived_data') as compute:
+            load_cpt(self.cpt_params, self.cache).ic
+        compute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from app.project.downsampling import min_max_downsample
+
+
+class TestMinMaxDownsample(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.default_rng(0)
+        self.length = 50000
+        self.layer_boundaries = [12345, 30001, 41000]
+        layer_qc = np.array([2., 15., 0.8, 25.])
+        layer = np.searchsorted(self.layer_boundaries, np.arange(self.length), side='right')
+        self.qc = layer_qc[layer] * random.lognormal(0., 0.1, self.length)
+        self.rf = 0.08 / np.sqrt(self.qc) * 100
+        self.peak_index = 22222
+        self.qc[self.peak_index] = 60.
+
+    def test_short_signal_is_kept(self):
+        indices = min_max_downsample([self.qc[:100], self.rf[:100]], 2000)
+        np.testing.assert_array_equal(indices, np.arange(100))
+
+    def test_point_budget(self):
+        indices = min_max_downsample([self.qc, self.rf], 2000)
+        self.assertLessEqual(len(indices), 2000 + 2)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], self.length - 1)
+
+    def test_peak_qc_is_kept(self):
+        indices = min_max_downsample([self.qc, self.rf], 2000)
+        self.assertIn(self.peak_index, indices)
+        self.assertEqual(self.qc[indices].max(), self.qc.max())
+        self.assertEqual(self.qc[indices].min(), self.qc.min())
+        self.assertEqual(self.rf[indices].max(), self.rf.max())
+
+    def test_layer_boundaries_are_kept(self):
+        max_points = 2000
+        indices = min_max_downsample([self.qc, self.rf], max_points)
+        bin_size = -(-self.length // (max_points // 6))
+        for boundary in self.layer_boundaries:
+            # The kept samples around the boundary are at most one bin away from it, on both sides
+            position = np.searchsorted(indices, boundary)
+            self.assertLessEqual(boundary - indices[position - 1], bin_size)
+            self.assertLess(indices[position] - boundary, bin_size)
+
+    def test_gaps_remain_visible(self):
+        qc = self.qc.copy()
+        qc[1000:1500] = np.nan
+        indices = min_max_downsample([qc, self.rf], 2000)
+        self.assertTrue(np.isnan(qc[indices]).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import tempfile
+import time
+import unittest
+
+from app.cpt_file.cache import CPTCache
+from app.project.fetching import fetch_cpts
+from benchmarks.offline import LATENCY
+from benchmarks.offline import LatencyEntity
+from benchmarks.offline import offline_viktor
+from benchmarks.synthetic import synthetic_cpt_params
+
+
+class TestFetchCpts(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = CPTCache(disk_budget=0, directory=directory.name)
+        offline = offline_viktor()
+        offline.__enter__()
+        self.addCleanup(offline.__exit__, None, None, None)
+        # Later entities respond first, so the completion order is the reverse of the selection order
+        self.entities = [
+            LatencyEntity(entity_id, synthetic_cpt_params(200, seed=entity_id, name=f'CPT-{entity_id:04d}'),
+                          latency=LATENCY * (1 - entity_id / 8))
+            for entity_id in range(8)
+        ]
+
+    def test_selection_order(self):
+        for max_workers in (1, 8):
+            cpts, errors = fetch_cpts(self.entities, max_workers=max_workers, cache=self.cache)
+            self.assertEqual([cpt.name for cpt in cpts], [entity.name for entity in self.entities])
+            self.assertEqual(errors, [])
+
+    def test_concurrent_requests(self):
+        start = time.perf_counter()
+        fetch_cpts(self.entities, max_workers=8, cache=self.cache)
+        self.assertLess(time.perf_counter() - start, sum(entity.latency for entity in self.entities) / 2)
+
+    def test_failing_entities(self):
+        self.entities[5].fail = True
+        self.entities[2].fail = True
+        cpts, errors = fetch_cpts(self.entities, max_workers=8, cache=self.cache)
+        self.assertEqual([cpt.name for cpt in cpts], [entity.name for entity in self.entities if not entity.fail])
+        self.assertEqual(errors, ['CPT-0002: injected failure', 'CPT-0005: injected failure'])
+
+    def test_invalid_params(self):
+        self.entities[3]._params = {'headers': {'name': 'CPT-0003'}}
+        cpts, errors = fetch_cpts(self.entities, max_workers=8, cache=self.cache)
+        self.assertEqual(len(cpts), len(self.entities) - 1)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('CPT-0003: '))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from app.cpt_file.model import CPT
+from app.project.figure_builder import IncrementalFigureBuilder
+from benchmarks.synthetic import synthetic_cpt_params
+
+
+class TestIncrementalFigureBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.params = [synthetic_cpt_params(1000, seed=seed) for seed in range(4)]
+
+    def cpts(self, keys):
+        return [CPT(self.params[index], key=key) for index, key in keys]
+
+    def test_selection_order_and_range(self):
+        builder = IncrementalFigureBuilder(200)
+        cpts = self.cpts([(0, 'a'), (1, 'b'), (2, 'c')])
+        traces, (bottom, top) = builder.update(cpts)
+        self.assertEqual([trace.name for trace in traces], [cpt.name for cpt in cpts])
+        self.assertEqual(bottom, min(cpt.extent[0] for cpt in cpts))
+        self.assertEqual(top, max(cpt.extent[1] for cpt in cpts))
+
+        traces, (bottom, top) = builder.update(cpts[2:])
+        self.assertEqual([trace.name for trace in traces], [cpts[2].name])
+        self.assertEqual((bottom, top), cpts[2].extent)
+
+    def test_added_cpts_only_are_prepared(self):
+        builder = IncrementalFigureBuilder(200)
+        first, _ = builder.update(self.cpts([(0, 'a'), (1, 'b')]))
+        second, _ = builder.update(self.cpts([(1, 'b'), (2, 'c')]))
+        self.assertIs(second[0], first[1])
+        self.assertEqual(set(builder._traces), {'b', 'c'})
+
+    def test_equal_extents(self):
+        builder = IncrementalFigureBuilder(200)
+        cpts = self.cpts([(0, 'a'), (0, 'b'), (0, None), (0, None)])
+        traces, elevation_range = builder.update(cpts)
+        self.assertEqual(len(traces), 4)
+        self.assertEqual(elevation_range, cpts[0].extent)
+
+    def test_cpts_without_key_are_not_kept(self):
+        builder = IncrementalFigureBuilder(200)
+        builder.update(self.cpts([(0, None), (1, 'b')]))
+        self.assertEqual(set(builder._traces), {'b'})
+        traces, elevation_range = builder.update(self.cpts([(3, None)]))
+        self.assertEqual(traces[0].name, self.params[3]['headers']['name'])
+        self.assertEqual(elevation_range, CPT(self.params[3]).extent)
+        self.assertEqual(builder.nbytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
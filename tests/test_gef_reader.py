@@ -0,0 +1,104 @@
+import json
+import unittest
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from viktor.geo import GEFData
+from viktor.geo import GEFParsingException
+
+from app.cpt_file.parsing import parse_gef
+from app.cpt_file.parsing import parse_gef_stream
+from app.cpt_file.serialization import decode_measurement_data
+from benchmarks.synthetic import synthetic_gef
+from tests.record_gef_fixtures import FIXTURE_DIRECTORY
+from tests.record_gef_fixtures import without_header
+
+
+def read_fixture(name: str) -> str:
+    return (FIXTURE_DIRECTORY / f'{name}.gef').read_text(encoding='ISO-8859-1')
+
+
+def parse_streaming(content: str, file_name: str = None) -> dict:
+    """Parse with the streaming reader, independent of the number of rows"""
+    with mock.patch('app.cpt_file.parsing.STREAMING_ROW_THRESHOLD', 0):
+        return parse_gef_stream(StringIO(content), file_name=file_name)
+
+
+def parse_recorded(name: str) -> dict:
+    """
+    Parse a fixture with `parse_gef`, of which GEFFile replays the output of viktor.geo.GEFFile recorded with
+    tests/record_gef_fixtures.py
+    """
+    recording = json.loads((FIXTURE_DIRECTORY / f'{name}.json').read_text())
+
+    class RecordedGEFFile:
+        def __init__(self, file_content: str):
+            pass
+
+        def parse(self, additional_columns=None, verbose=True, return_gef_data_obj=True):
+            if 'exception' in recording:
+                raise GEFParsingException(recording['exception'])
+            gef_data = GEFData(recording['gef_data'])
+            return gef_data if return_gef_data_obj else gef_data.serialize()
+
+    with mock.patch('app.cpt_file.parsing.GEFFile', RecordedGEFFile):
+        return parse_gef(read_fixture(name))
+
+
+class TestStreamingReaderParity(unittest.TestCase):
+
+    def assert_parity(self, name: str):
+        streamed, reference = parse_streaming(read_fixture(name)), parse_recorded(name)
+        self.assertEqual(streamed['headers'], reference['headers'])
+        self.assertEqual(streamed['derived_data']['layers'], reference['derived_data']['layers'])
+        streamed_data = decode_measurement_data(streamed['measurement_data'])
+        reference_data = decode_measurement_data(reference['measurement_data'])
+        self.assertEqual(set(streamed_data), set(reference_data))
+        for column in reference_data:
+            np.testing.assert_allclose(np.array(streamed_data[column], dtype=np.float64),
+                                       np.array(reference_data[column], dtype=np.float64), rtol=1e-6, err_msg=column)
+
+    def assert_both_raise(self, name: str):
+        with self.assertRaises(GEFParsingException):
+            parse_streaming(read_fixture(name))
+        with self.assertRaises(GEFParsingException):
+            parse_recorded(name)
+
+    def test_headers_and_columns(self):
+        self.assert_parity('headers_and_columns')
+
+    def test_layers(self):
+        for seed in range(3):
+            self.assert_parity(f'layers_{seed}')
+
+    def test_missing_values(self):
+        self.assert_parity('missing_values')
+
+    def test_friction_ratio_from_local_friction(self):
+        self.assert_parity('friction_ratio_from_local_friction')
+
+    def test_missing_qc_column(self):
+        self.assert_both_raise('missing_qc_column')
+
+    def test_missing_friction_columns(self):
+        self.assert_both_raise('missing_friction_columns')
+
+    def test_missing_ground_level(self):
+        self.assert_both_raise('missing_ground_level')
+
+    def test_missing_test_id(self):
+        cpt_params = parse_streaming(without_header(synthetic_gef(100), '#TESTID'), file_name='CPT-0001.gef')
+        self.assertEqual(cpt_params['headers']['name'], 'CPT-0001.gef')
+
+    def test_missing_last_scan(self):
+        content = read_fixture('missing_last_scan')
+        with mock.patch('app.cpt_file.parsing.parse_gef') as parse_with_gef_file:
+            cpt_params = parse_gef_stream(StringIO(content))
+        parse_with_gef_file.assert_not_called()
+        self.assertEqual(len(decode_measurement_data(cpt_params['measurement_data'])['qc']), 1000)
+        self.assertEqual(cpt_params['headers'], parse_recorded('missing_last_scan')['headers'])
+
+
+if __name__ == '__main__':
+    unittest.main()
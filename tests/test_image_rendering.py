@@ -0,0 +1,45 @@
+import pickle
+import tempfile
+import unittest
+
+from app.cpt_file.cache import CPTCache
+from app.cpt_file.cache import load_cpt
+from app.project.image_rendering import RenderCache
+from app.project.image_rendering import kaleido
+from app.project.image_rendering import render_comparisons
+from benchmarks.synthetic import synthetic_cpt_params
+
+
+class TestRenderComparisons(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cpt_cache = CPTCache(directory=f'{directory.name}/cpts')
+        self.render_cache = RenderCache(directory=f'{directory.name}/renders')
+        self.cpts = [load_cpt(synthetic_cpt_params(500, seed=seed, name=f'CPT-{seed:04d}'), self.cpt_cache)
+                     for seed in range(3)]
+        self.options = {'single_graph': True, 'envelope': False, 'show_ic': False, 'max_points': 200}
+
+    def test_cached_cpts_can_be_pickled(self):
+        cpt = pickle.loads(pickle.dumps(self.cpts[0]))
+        self.assertEqual(cpt.name, self.cpts[0].name)
+        self.assertEqual(cpt.extent, self.cpts[0].extent)
+
+    @unittest.skipIf(kaleido is None, 'static image export requires kaleido')
+    def test_process_pool(self):
+        jobs = {'first': (self.cpts[:2], self.options), 'second': (self.cpts[1:], self.options)}
+        images, errors = render_comparisons(jobs, 'svg', max_workers=2, cache=self.render_cache)
+        self.assertEqual(errors, {})
+        self.assertEqual(list(images), ['first', 'second'])
+
+    def test_failing_job(self):
+        jobs = {'first': (self.cpts[:2], self.options), 'invalid': (self.cpts[1:], {'unknown': True})}
+        images, errors = render_comparisons(jobs, 'svg', max_workers=2, cache=self.render_cache)
+        self.assertEqual(list(errors), ['invalid'])
+        if kaleido is not None:
+            self.assertEqual(list(images), ['first'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from app.cpt_file.model import CPT
+from app.project.cpt_comparison_helper_functions import visualize_multiple_cpts_in_graph
+from benchmarks.offline import offline_viktor
+from benchmarks.synthetic import synthetic_cpt_params
+
+
+class TestPagedMultipleGraphs(unittest.TestCase):
+
+    def setUp(self):
+        offline = offline_viktor()
+        offline.__enter__()
+        self.addCleanup(offline.__exit__, None, None, None)
+        self.cpts = [CPT(synthetic_cpt_params(200, seed=seed), key=f'cpt-{seed}') for seed in range(7)]
+
+    def test_full_page_matches_unpaged_axes(self):
+        for show_ic in (False, True):
+            unpaged = visualize_multiple_cpts_in_graph(self.cpts[:3], show_ic=show_ic)
+            paged = visualize_multiple_cpts_in_graph(self.cpts, page_size=3, page=1, show_ic=show_ic)
+            self.assertEqual([(trace.xaxis, trace.yaxis) for trace in paged.data],
+                             [(trace.xaxis, trace.yaxis) for trace in unpaged.data])
+            self.assertEqual([annotation.text for annotation in paged.layout.annotations],
+                             [annotation.text for annotation in unpaged.layout.annotations])
+            for axis in ('xaxis', 'xaxis4', 'yaxis6'):
+                self.assertEqual(paged.layout[axis].anchor, unpaged.layout[axis].anchor)
+                self.assertEqual(paged.layout[axis].domain, unpaged.layout[axis].domain)
+
+    def test_last_page(self):
+        figure = visualize_multiple_cpts_in_graph(self.cpts, page_size=3, page=3, show_ic=True)
+        self.assertEqual([(trace.name, trace.xaxis, trace.yaxis) for trace in figure.data], [
+            ('Qc CPT-0006.gef', 'x', 'y'),
+            ('Friction number CPT-0006.gef', 'x4', 'y4'),
+            ('Soil behaviour type index CPT-0006.gef', 'x7', 'y7'),
+        ])
+        self.assertEqual([annotation.text for annotation in figure.layout.annotations], ['CPT-0006', '', ''])
+        self.assertEqual(figure.layout.title.text, 'CPTs 7-7 of 7 (page 3 of 3)')
+
+        # The subplots without a cpt are hidden, the others keep the axes of the template
+        for number in (1, 4, 7):
+            suffix = '' if number == 1 else str(number)
+            self.assertIsNot(figure.layout[f'xaxis{suffix}'].visible, False)
+            self.assertIsNot(figure.layout[f'yaxis{suffix}'].visible, False)
+        for number in (2, 3, 5, 6, 8, 9):
+            self.assertIs(figure.layout[f'xaxis{number}'].visible, False)
+            self.assertIs(figure.layout[f'yaxis{number}'].visible, False)
+
+    def test_elevation_range_of_the_selection(self):
+        bottom = min(cpt.extent[0] for cpt in self.cpts)
+        for page in (1, 2, 3):
+            figure = visualize_multiple_cpts_in_graph(self.cpts, page_size=3, page=page)
+            self.assertEqual(figure.layout.yaxis.range, visualize_multiple_cpts_in_graph(self.cpts).layout.yaxis.range)
+            self.assertLess(figure.layout.yaxis.range[0], bottom)
+
+    def test_page_out_of_range(self):
+        figure = visualize_multiple_cpts_in_graph(self.cpts, page_size=3, page=5)
+        self.assertEqual(figure.layout.title.text, 'CPTs 7-7 of 7 (page 3 of 3)')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from app.cpt_file.serialization import SCHEMA_VERSION
+from app.cpt_file.serialization import content_hash
+from app.cpt_file.serialization import decode_column
+from app.cpt_file.serialization import decode_measurement_data
+from app.cpt_file.serialization import encode_measurement_data
+from app.cpt_file.serialization import is_encoded
+from app.cpt_file.serialization import zstandard
+from benchmarks.synthetic import synthetic_measurement_data
+
+
+class TestMeasurementDataEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.measurement_data = synthetic_measurement_data(1000, seed=1, missing_fraction=0.05)
+
+    def test_float32_round_trip(self):
+        encoded = encode_measurement_data(self.measurement_data, dtype='<f4')
+        self.assertTrue(is_encoded(encoded))
+        self.assertEqual(decode_measurement_data(encoded), self.measurement_data)
+
+    def test_float64_round_trip(self):
+        measurement_data = {'qc': [1 / 3, 2 ** -40, None, 1e300], 'elevation': [0.1, -0.2, 0.3, None]}
+        encoded = encode_measurement_data(measurement_data, dtype='<f8')
+        self.assertEqual(decode_measurement_data(encoded), measurement_data)
+
+    def test_missing_values(self):
+        encoded = encode_measurement_data({'qc': [1.5, None, float('nan'), 2.5]})
+        np.testing.assert_array_equal(decode_column(encoded, 'qc'), [1.5, np.nan, np.nan, 2.5])
+        self.assertEqual(decode_measurement_data(encoded), {'qc': [1.5, None, None, 2.5]})
+
+    def test_compressions(self):
+        compressions = ['none', 'zlib'] + (['zstd'] if zstandard is not None else [])
+        for compression in compressions:
+            encoded = encode_measurement_data(self.measurement_data, compression=compression)
+            self.assertEqual(decode_measurement_data(encoded), self.measurement_data, msg=compression)
+
+    def test_list_format_is_passed_through(self):
+        self.assertFalse(is_encoded(self.measurement_data))
+        self.assertIs(decode_measurement_data(self.measurement_data), self.measurement_data)
+        np.testing.assert_array_equal(decode_column(self.measurement_data, 'qc'),
+                                      np.array(self.measurement_data['qc'], dtype=np.float64))
+
+    def test_newer_schema_version_is_rejected(self):
+        encoded = encode_measurement_data(self.measurement_data)
+        encoded['schema_version'] = SCHEMA_VERSION + 1
+        with self.assertRaises(ValueError):
+            decode_measurement_data(encoded)
+
+    def test_unsupported_options_are_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_measurement_data(self.measurement_data, dtype='<f2')
+        with self.assertRaises(ValueError):
+            encode_measurement_data(self.measurement_data, compression='lzma')
+
+    def test_content_hash(self):
+        headers = {'name': 'CPT-0001'}
+        encoded = encode_measurement_data(self.measurement_data)
+        self.assertEqual(content_hash(headers, encoded), content_hash(headers, dict(encoded)))
+        self.assertNotEqual(content_hash(headers, encoded), content_hash({'name': 'CPT-0002'}, encoded))
+        changed = dict(self.measurement_data, qc=[1.] + self.measurement_data['qc'][1:])
+        self.assertNotEqual(content_hash(headers, self.measurement_data), content_hash(headers, changed))
+
+
+if __name__ == '__main__':
+    unittest.main()